@@ -396,8 +396,10 @@ def run_long_task(text_widget, root, progressbar):
     output_csv2 = os.path.join(csv_stuff_dir, "domain.csv")
     print("開始執行 merge_csv...")
     thread_safe_log("開始執行 merge_csv...", text_widget, root)
+    # total.csv 與 domain.csv 由同一次讀取、去重一起輸出
     try:
-        subprocess.run([merge_exe, "--input-dir", input_dir, "--output-file", output_csv], check=True)
+        subprocess.run([merge_exe, "--input-dir", input_dir, "--output-file", output_csv,
+                        "--domain-output", output_csv2], check=True)
     except Exception as e:
         print(f"merge_csv 執行失敗：{e}")
         thread_safe_log(f"merge_csv 執行失敗：{e}", text_widget, root)
@@ -412,14 +414,6 @@ def run_long_task(text_widget, root, progressbar):
 
     print(f"合併後 CSV 檔案：{output_csv}")
     thread_safe_log(f"合併後 CSV 檔案：{output_csv}", text_widget, root)
-    
-    try:
-        subprocess.run([merge_exe, "--input-dir", input_dir, "--output-file", output_csv2], check=True)
-    except Exception as e:
-        print(f"merge_csv 執行失敗：{e}")
-        thread_safe_log(f"merge_csv 執行失敗：{e}", text_widget, root)
-        root.after(0, progressbar.stop)
-        return
 
     if not os.path.isfile(output_csv2):
         print(f"錯誤：找不到合併後的 domain.csv：{output_csv2}")
@@ -446,35 +440,14 @@ def run_long_task(text_widget, root, progressbar):
             print(f"{task_name} 執行失敗：{e}")
             thread_safe_log(f"{task_name} 執行失敗：{e}", text_widget, root)
 
-    # 桌面版 (laptop) 指令 (不帶 --mobile)
-    lap_screenshot_total_cmd = [web_capture_exe, "screenshot", "--csv", output_csv, "--output", LAP_PNG_DIR]
-    lap_html_total_cmd = [web_capture_exe, "html", "--csv", output_csv, "--output", LAP_HTML_DIR]
-    # 手機版 (mobile) 指令 (帶 --mobile)
-    mob_screenshot_total_cmd = [web_capture_exe, "screenshot", "--csv", output_csv, "--output", MOB_PNG_DIR, "--mobile"]
-    mob_html_total_cmd = [web_capture_exe, "html", "--csv", output_csv, "--output", MOB_HTML_DIR, "--mobile"]
-
-    # 桌面版 (laptop) 指令 (不帶 --mobile)
-    lap_screenshot_domain_cmd = [web_capture_exe, "screenshot", "--csv", output_csv2, "--output", LAP_PNG_DIR]
-    lap_html_domain_cmd = [web_capture_exe, "html", "--csv", output_csv2, "--output", LAP_HTML_DIR]
-    # 手機版 (mobile) 指令 (帶 --mobile)
-    mob_screenshot_domain_cmd = [web_capture_exe, "screenshot", "--csv", output_csv2, "--output", MOB_PNG_DIR, "--mobile"]
-    mob_html_domain_cmd = [web_capture_exe, "html", "--csv", output_csv2, "--output", MOB_HTML_DIR, "--mobile"]
-
-    threads = []
-    for cmd, task in [(lap_screenshot_total_cmd, "桌面截圖(subdomain)"),
-                  (lap_html_total_cmd, "桌面 HTML(subdomain)"),
-                  (mob_screenshot_total_cmd, "手機截圖(subdomain)"),
-                  (mob_html_total_cmd, "手機 HTML(subdomain)"),
-                  (lap_screenshot_domain_cmd, "桌面截圖(domain)"),
-                  (lap_html_domain_cmd, "桌面 HTML(domain)"),
-                  (mob_screenshot_domain_cmd, "手機截圖(domain)"),
-                  (mob_html_domain_cmd, "手機 HTML(domain)"),
-                  ]:
-        t = threading.Thread(target=run_capture, args=(cmd, task))
-        t.start()
-        threads.append(t)
-    for t in threads:
-        t.join()
+    # capture 模式：每個網址只載入一次，同時輸出 PNG 與 HTML
+    # 瀏覽器池模式：只啟動一個 Chrome，桌面版與手機版以獨立分頁同時擷取，
+    # 輸出至 OUTPUT_DIR/laptop/{png,html} 與 OUTPUT_DIR/mobile/{png,html}
+    # total.csv 與 domain.csv 一次傳入：重複網址只載入一次，再依各自的命名規則（domain 列為 _1_）複製檔案
+    # --index-html：擷取後建立 html/html_index.sqlite3（標題、表單目標、外部 script、品牌、密碼／信用卡欄位）
+    capture_cmd = [web_capture_exe, "capture", "--csv", output_csv, output_csv2, "--browser-pool", "--tabs", "4",
+                   "--profiles", "laptop,mobile", "--output-root", OUTPUT_DIR, "--index-html"]
+    run_capture(capture_cmd, "桌面與手機截圖與 HTML(subdomain + domain)")
     print("web_capture 所有任務已完成。")
     thread_safe_log("web_capture 所有任務已完成。", text_widget, root)
 
@@ -0,0 +1,395 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import threading
+import collections
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import web_capture
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 頁面種類：static 靜態頁、js 由 JavaScript 產生內容、redirect 302 轉址、refresh meta refresh 轉址、
+# 429 第一次請求回 429（Retry-After: 1）之後正常、404 失效頁、tall 超高頁面（測整頁截圖）、slow 延遲 5 倍
+PAGE_KINDS = ["static", "js", "redirect", "refresh", "429", "404", "tall", "slow"]
+DEFAULT_MIX = "static=6,js=2,redirect=1,refresh=1,429=1,404=1,tall=1,slow=1"
+CSV_HEADER = ["編號", "網站", "網址", "詐騙網站創建日期", "網域", "接獲通報日期", "含子域名", "停止解析日期"]
+# 由本程式建立的輸出資料夾會放這個標記檔，只有帶標記的資料夾才會在下次執行前清空
+OUTPUT_MARKER = ".bench_capture_output"
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360f8cfc0f01f0005000201e2217bc80000000049454e44ae426082")
+
+def parse_mix(mix):
+    """解析 --mix（例如 static=6,js=2），回傳 {種類: 權重}。"""
+    weights = {}
+    for part in mix.split(","):
+        if not part.strip():
+            continue
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in PAGE_KINDS:
+            raise ValueError(f"未知的頁面種類：{kind}（可用：{', '.join(PAGE_KINDS)}）")
+        weights[kind] = int(weight or 1)
+    return weights
+
+def build_page_plan(pages, mix, seed=0):
+    """依權重依序輪流分配頁面種類，回傳長度為 pages 的種類 list；同一組參數每次結果相同。"""
+    kinds = [kind for kind, weight in parse_mix(mix).items() for _ in range(weight)]
+    plan = [kinds[i % len(kinds)] for i in range(pages)]
+    random.Random(seed).shuffle(plan)
+    return plan
+
+class SyntheticSite:
+    """
+    本機合成網站：/<kind>/<i> 依種類回傳不同的頁面，每個回應前先等待 latency ± jitter 毫秒。
+    每頁另外引用一張圖片與一段影片（/asset/），可用來比較資源封鎖的效果。
+    """
+    def __init__(self, latency_ms=200, jitter_ms=100, size_kb=50, asset_kb=200, js_delay_ms=300, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.size_kb = size_kb
+        self.asset_kb = asset_kb
+        self.js_delay_ms = js_delay_ms
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.hits = collections.Counter()
+        self.requests = collections.Counter()
+        self.server = None
+
+    def start(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                site.handle(self, head=True)
+
+            def do_GET(self):
+                site.handle(self, head=False)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _delay(self, factor=1):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) * factor / 1000)
+
+    def _filler(self, index):
+        sentence = f"合成測試頁面 {index}：此段文字僅用於產生指定大小的頁面內容。"
+        repeat = max(1, self.size_kb * 1024 // len(sentence.encode("utf-8")))
+        return "".join(f"<p>{sentence}</p>" for _ in range(repeat))
+
+    def _page(self, kind, index):
+        assets = (f'<img src="/asset/{index}.png" width="200" height="100">'
+                  f'<video src="/asset/{index}.mp4" autoplay muted></video>')
+        title = f"Bench {kind} {index}"
+        if kind == "js":
+            body = (f"<div id=\"root\"></div><script>setTimeout(function () {{"
+                    f"document.getElementById('root').innerHTML = {json.dumps(self._filler(index) + assets)};"
+                    f"document.title = {json.dumps(title)};}}, {self.js_delay_ms});</script>")
+            return "<html><head><title>Loading</title></head><body>" + body + "</body></html>"
+        if kind == "refresh":
+            return (f"<html><head><meta http-equiv=\"refresh\" content=\"0;url=/static/{index}\">"
+                    f"<title>Redirecting</title></head><body></body></html>")
+        style = ' style="height:15000px;background:linear-gradient(#fff,#39c)"' if kind == "tall" else ""
+        return (f"<html><head><title>{title}</title></head>"
+                f"<body><div{style}>{self._filler(index)}{assets}</div></body></html>")
+
+    def handle(self, handler, head=False):
+        path = urlparse(handler.path).path
+        parts = path.strip("/").split("/")
+        kind = parts[0] if parts else ""
+        with self.lock:
+            self.requests[kind] += 1
+            self.hits[path] += 1
+            first_hit = self.hits[path] == 1
+
+        if kind == "asset":
+            body = TINY_PNG if path.endswith(".png") else b"\0" * (self.asset_kb * 1024)
+            content_type = "image/png" if path.endswith(".png") else "video/mp4"
+            return self._send(handler, 200, body, content_type, head)
+
+        self._delay(5 if kind == "slow" else 1)
+        index = parts[1] if len(parts) > 1 else "0"
+        if kind == "404" or kind not in PAGE_KINDS:
+            return self._send(handler, 404, b"<html><body>Not Found</body></html>", "text/html", head)
+        if kind == "429" and first_hit:
+            return self._send(handler, 429, b"Too Many Requests", "text/plain", head, {"Retry-After": "1"})
+        if kind == "redirect":
+            return self._send(handler, 302, b"", "text/html", head, {"Location": f"/static/{index}"})
+        body = self._page(kind, index).encode("utf-8")
+        return self._send(handler, 200, body, "text/html; charset=utf-8", head)
+
+    @staticmethod
+    def _send(handler, status, body, content_type, head, headers=None):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        if not head:
+            handler.wfile.write(body)
+
+def write_bench_csv(csv_file, base_url, plan):
+    """產生與 merge_csv 輸出相同欄位配置的 total.csv（網址在第 3 欄、網域在第 5 欄）。"""
+    os.makedirs(os.path.dirname(csv_file), exist_ok=True)
+    with open(csv_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for index, kind in enumerate(plan):
+            domain = f"{kind}-{index}.bench.test"
+            writer.writerow([index + 1, "bench", f"{base_url}/{kind}/{index}", "", domain, "", domain, ""])
+
+class PeakRSSMonitor:
+    """
+    執行期間定期取樣記憶體用量，回傳峰值（bytes）。
+    有安裝 psutil 時合計本程序與所有子程序（chromedriver、Chrome、編碼 process pool）；
+    否則只能取得本程序的峰值（Windows 為 PeakWorkingSetSize，其他平台為 ru_maxrss）。
+    """
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.scope = "process tree" if psutil else "python process"
+
+    def _sample(self):
+        if psutil:
+            proc = psutil.Process()
+            total = 0
+            for p in [proc] + proc.children(recursive=True):
+                try:
+                    total += p.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        return self.process_peak()
+
+    @staticmethod
+    def process_peak():
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+            return counters.PeakWorkingSetSize
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 的單位為 KB，macOS 為 bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.peak = max(self.peak, self._sample())
+            except Exception:
+                pass
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self._sample())
+        return self.peak
+
+def summarize_stages(timing_file):
+    """
+    讀取 stage_timing.jsonl，回傳 ({階段: (筆數, p50, p95)}, 成功筆數, 失敗筆數)。
+    各階段耗時包含延後重試的每次嘗試；成功與失敗只依每個網址的最終狀態計算一次，retry 行不計入。
+    """
+    samples = collections.defaultdict(list)
+    final_status = {}
+    with open(timing_file, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["status"] != "retry":
+                final_status[(entry["url"], entry.get("profile"))] = entry["status"]
+            for name, seconds in entry["stages"].items():
+                samples[name].append(seconds)
+    ok = sum(status == "ok" for status in final_status.values())
+    failed = len(final_status) - ok
+    stages = {}
+    for name in web_capture.TIMING_STAGES:
+        values = samples.get(name)
+        if values:
+            stages[name] = (len(values), web_capture.percentile(values, 50), web_capture.percentile(values, 95))
+    return stages, ok, failed
+
+def prepare_output_dir(out_dir):
+    """
+    清空上次基準測試的輸出資料夾：只刪除帶有 OUTPUT_MARKER 的資料夾（本程式建立的），
+    不是本程式建立且非空的資料夾（例如誤指定為實際的輸出資料夾）一律拒絕。
+    """
+    if os.path.exists(out_dir):
+        if os.path.exists(os.path.join(out_dir, OUTPUT_MARKER)):
+            shutil.rmtree(out_dir)
+        elif os.listdir(out_dir):
+            print(f"[錯誤] {out_dir} 不是 bench_capture 建立的資料夾且不是空的，請改用其他 --output")
+            sys.exit(1)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, OUTPUT_MARKER), "w", encoding="utf-8") as f:
+        f.write("bench_capture output\n")
+
+def run_benchmark(args):
+    out_dir = os.path.abspath(args.output)
+    prepare_output_dir(out_dir)
+    plan = build_page_plan(args.pages, args.mix, seed=args.seed)
+    site = SyntheticSite(latency_ms=args.latency, jitter_ms=args.jitter, size_kb=args.size_kb,
+                         asset_kb=args.asset_kb, js_delay_ms=args.js_delay, seed=args.seed).start()
+    csv_file = os.path.join(out_dir, "csv_stuff", "total.csv")
+    png_dir = os.path.join(out_dir, "png")
+    html_dir = os.path.join(out_dir, "html")
+    write_bench_csv(csv_file, site.base_url, plan)
+    print(f"[bench] 合成網站 {site.base_url}，{args.pages} 頁：{dict(collections.Counter(plan))}")
+
+    driver_options = {
+        "headless": args.headless,
+        "is_mobile": args.mobile,
+        "wait_strategy": args.wait_strategy,
+        "block_level": args.block,
+    }
+    image_options = {"full_page": args.full_page, "image_format": args.image_format}
+    run_options = {
+        "load_wait": args.load_wait,
+        "workers": args.workers,
+        "preflight": args.preflight,
+        "host_rate": args.host_rate,
+        "encode_workers": args.encode_workers,
+        "cache_dir": None,
+    }
+    out = html_dir if args.mode == "html" else png_dir
+    monitor = PeakRSSMonitor().start()
+    start = time.time()
+    try:
+        capturer = web_capture.build_capturer(args.mode, [csv_file], out, html_dir, image_options,
+                                              driver_options, tiered=args.tiered)
+        capturer.run(**run_options)
+    finally:
+        elapsed = time.time() - start
+        peak = monitor.stop()
+        site.stop()
+
+    stages, ok, failed = summarize_stages(os.path.join(out, web_capture.StageTimingLog.FILE_NAME))
+    processed = ok + failed
+    result = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "label": args.label,
+        "mode": args.mode,
+        "pages": args.pages,
+        "mix": args.mix,
+        "workers": args.workers,
+        "wait_strategy": args.wait_strategy,
+        "block": args.block,
+        "tiered": args.tiered,
+        "latency_ms": args.latency,
+        "elapsed_seconds": round(elapsed, 2),
+        "urls_per_min": round(processed / (elapsed / 60), 2) if elapsed > 0 else 0.0,
+        "ok": ok,
+        "failed": failed,
+        "peak_rss_mb": round(peak / (1024 * 1024), 1),
+        "rss_scope": monitor.scope,
+        "stages": {name: {"count": c, "p50": round(p50, 3), "p95": round(p95, 3)}
+                   for name, (c, p50, p95) in stages.items()},
+        "server_requests": dict(site.requests),
+    }
+    return result
+
+def print_report(result):
+    print("=" * 60)
+    print(f"[bench] {result['label'] or result['mode']}：{result['pages']} 頁，"
+          f"成功 {result['ok']}、失敗 {result['failed']}，耗時 {result['elapsed_seconds']:.1f} 秒")
+    print(f"[bench] 吞吐量 {result['urls_per_min']:.2f} URLs/min，"
+          f"峰值記憶體 {result['peak_rss_mb']:.1f} MB（{result['rss_scope']}）")
+    print(f"[bench] {'階段':<10} {'筆數':>6} {'p50(秒)':>9} {'p95(秒)':>9}")
+    for name, stat in result["stages"].items():
+        print(f"[bench] {name:<10} {stat['count']:>6} {stat['p50']:>9.3f} {stat['p95']:>9.3f}")
+    print("=" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description="web_capture 本機合成網站效能基準測試")
+    parser.add_argument("--mode", choices=["screenshot", "html", "capture"], default="screenshot",
+                        help="要測試的 web_capture 模式 (預設：screenshot)")
+    parser.add_argument("--pages", type=int, default=40, help="合成頁面數量 (預設：40)")
+    parser.add_argument("--mix", type=str, default=DEFAULT_MIX,
+                        help=f"頁面種類與權重，種類：{', '.join(PAGE_KINDS)} (預設：{DEFAULT_MIX})")
+    parser.add_argument("--latency", type=int, default=200, help="每個頁面回應的延遲毫秒數 (預設：200)")
+    parser.add_argument("--jitter", type=int, default=100, help="延遲的隨機變動毫秒數 (預設：100)")
+    parser.add_argument("--size-kb", type=int, default=50, help="每頁文字內容大小 KB (預設：50)")
+    parser.add_argument("--asset-kb", type=int, default=200, help="每頁引用的影片大小 KB (預設：200)")
+    parser.add_argument("--js-delay", type=int, default=300, help="js 頁面延遲產生內容的毫秒數 (預設：300)")
+    parser.add_argument("--seed", type=int, default=0, help="頁面分配與延遲的亂數種子 (預設：0)")
+    parser.add_argument("--workers", type=int, default=2, help="同時運作的 Chrome driver 數量 (預設：2)")
+    parser.add_argument("--wait-strategy", choices=web_capture.WAIT_STRATEGIES, default="ready",
+                        help="頁面就緒等待策略 (預設：ready)")
+    parser.add_argument("--load-wait", type=float, default=3, help="固定等待秒數 (預設：3)")
+    parser.add_argument("--block", choices=["auto"] + list(web_capture.BLOCK_LEVELS), default="auto",
+                        help="資源封鎖等級 (預設：auto)")
+    parser.add_argument("--tiered", action="store_true", help="html 模式使用分層擷取")
+    parser.add_argument("--no-preflight", action="store_false", dest="preflight", help="停用平行 HEAD 預檢")
+    parser.add_argument("--host-rate", type=float, default=0,
+                        help="每個註冊網域每秒可開啟的頁面數；合成頁面都在 127.0.0.1，預設 0 不限速")
+    parser.add_argument("--encode-workers", type=int, default=2, help="背景編碼的 process 數 (預設：2)")
+    parser.add_argument("--image-format", choices=list(web_capture.IMAGE_FORMATS), default="png",
+                        help="截圖輸出格式 (預設：png)")
+    parser.add_argument("--full-page", action="store_true", help="以 CDP 擷取整頁截圖")
+    parser.add_argument("--mobile", action="store_true", help="啟用手機模擬模式")
+    parser.add_argument("--no-headless", action="store_false", dest="headless", help="停用 headless 模式")
+    parser.add_argument("--output", type=str, default=os.path.join(".", "bench_output"),
+                        help="基準測試輸出資料夾，每次執行前會清空（只清空本程式建立的資料夾）(預設：./bench_output)")
+    parser.add_argument("--label", type=str, default="", help="這次測試的標籤，寫入結果檔以便比較")
+    parser.add_argument("--results", type=str, default="bench_results.jsonl",
+                        help="累積結果的 JSONL 檔案，每次執行附加一行 (預設：bench_results.jsonl)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print_report(result)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"[bench] 結果已附加至 {args.results}")
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
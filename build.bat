@@ -9,7 +9,7 @@ setlocal enabledelayedexpansion
 set PYTHON_ENV=E:\env
 
 :: 定義 (exe檔名 : py檔名) 的對應清單
-set SCRIPTS=CyberTracker:UI.py web_capture:web_capture.py merge_csv:merge_csv.py csv_to_xlsx:csv_to_xlsx.py
+set SCRIPTS=CyberTracker:UI.py web_capture:web_capture.py merge_csv:merge_csv.py csv_to_xlsx:csv_to_xlsx.py screenshot_index:screenshot_index.py html_index:html_index.py report_history:report_history.py
 
 :: 檢查並啟用虛擬環境
 if exist "%PYTHON_ENV%\Scripts\activate" (
@@ -23,8 +23,8 @@ if exist "%PYTHON_ENV%\Scripts\activate" (
 for %%A in (%SCRIPTS%) do (
     for /f "tokens=1,2 delims=:" %%B in ("%%A") do (
         echo packing %%C to %%B.exe...
-        echo Running: pyinstaller --onefile --noconsole "%%C" --name "%%B" --log-level=DEBUG
-        pyinstaller --onefile --noconsole "%%C" --name "%%B" --log-level=DEBUG
+        echo Running: pyinstaller --onefile --noconsole "%%C" --name "%%B" --add-data "public_suffix_list.dat;." --log-level=DEBUG
+        pyinstaller --onefile --noconsole "%%C" --name "%%B" --add-data "public_suffix_list.dat;." --log-level=DEBUG
 
         if !errorlevel!==0 (
             echo %%B success
@@ -0,0 +1,139 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url):
+    """
+    正規化網址作為快取 key：
+      - scheme 與主機名稱轉小寫，去掉預設 port
+      - 去掉 #fragment，空路徑補成 "/"
+    query string 保持不變（釣魚頁常以參數區分受害者）。
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+def link_or_copy(src, dst):
+    """優先建立硬連結（不佔額外空間），不支援時（跨磁碟、FAT 等）改為複製。"""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+class CaptureCache:
+    """
+    跨執行的擷取快取（預設為程式目錄下的 capture_cache/）：
+      - key 為 正規化網址 + 裝置 profile（laptop/mobile）+ 檔案類型（png/html）
+      - 索引存在 SQLite（多個 web_capture 程序可同時讀寫），檔案本體存於同資料夾
+      - ttl_hours 內的項目視為新鮮，可直接沿用，不需重新開啟網頁
+      - 總大小超過 max_bytes 時，依最後使用時間（LRU）淘汰
+    """
+    def __init__(self, cache_dir, ttl_hours=24, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), timeout=30, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                title TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(url, profile, kind):
+        raw = f"{normalize_url(url)}|{profile}|{kind}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key, kind):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{kind}")
+
+    def lookup(self, url, profile, kinds):
+        """
+        所有 kinds 都有新鮮快取時回傳 (title, {kind: 快取檔路徑}, 最早的擷取時間)，否則回傳 None。
+        """
+        now = time.time()
+        found = {}
+        title = None
+        created = now
+        with self.lock:
+            for kind in kinds:
+                key = self.make_key(url, profile, kind)
+                row = self.conn.execute("SELECT title, created FROM entries WHERE key = ?", (key,)).fetchone()
+                path = self._path(key, kind)
+                if not row or now - row[1] > self.ttl_seconds or not os.path.exists(path):
+                    self.misses += 1
+                    return None
+                title = row[0]
+                created = min(created, row[1])
+                found[kind] = path
+            for kind in kinds:
+                self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?",
+                                  (now, self.make_key(url, profile, kind)))
+            self.conn.commit()
+            self.hits += 1
+        return title, found, created
+
+    def store(self, url, profile, kind, title, src_path):
+        key = self.make_key(url, profile, kind)
+        path = self._path(key, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        link_or_copy(src_path, tmp_path)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, url, profile, kind, title, created, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_url(url), profile, kind, title, now, now, os.path.getsize(path)))
+            self.conn.commit()
+
+    def evict(self):
+        """總大小超過上限時，從最久未使用的項目開始刪除；回傳刪除的項目數。"""
+        removed = 0
+        with self.lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            rows = self.conn.execute("SELECT key, kind, size FROM entries ORDER BY last_access").fetchall()
+            for key, kind, size in rows:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self._path(key, kind))
+                except FileNotFoundError:
+                    pass
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+            self.conn.commit()
+        return removed
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,178 @@
+import json
+import time
+import socket
+import sqlite3
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# getaddrinfo 表示「主機不存在」與「沒有位址紀錄」的錯誤碼（POSIX 為 EAI_*，Windows 為 WSA*）
+NXDOMAIN_ERRNOS = {getattr(socket, "EAI_NONAME", -2), 11001}
+NODATA_ERRNOS = {getattr(socket, "EAI_NODATA", -5), 11004}
+# 可確定已失效、會寫入快取並直接略過的狀態；error（逾時、暫時性失敗）不快取，交給後續預檢判斷
+DEAD_STATUSES = ("nxdomain", "noaddr")
+
+class DNSStatus:
+    """單一主機的解析結果：status 為 live、nxdomain、noaddr 或 error。"""
+    def __init__(self, host, status, addresses=(), elapsed=0.0, cached=False, error=None):
+        self.host = host
+        self.status = status
+        self.addresses = list(addresses)
+        self.elapsed = elapsed
+        self.cached = cached
+        self.error = error
+
+    @property
+    def dead(self):
+        return self.status in DEAD_STATUSES
+
+def system_resolver(host):
+    """以系統的 getaddrinfo 解析，回傳不重複的位址 list。"""
+    infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    return sorted({info[4][0] for info in infos})
+
+class StubResolver:
+    """
+    測試用的本機 stub resolver，不需要網路：讀取 hosts 格式的對照檔，一行一筆「位址 主機名稱」，
+    位址寫 NXDOMAIN 或 NODATA 時模擬對應的查詢失敗；檔案中沒有列出的主機視為 NXDOMAIN。
+    """
+    def __init__(self, mapping):
+        self.mapping = {host.lower(): addresses for host, addresses in mapping.items()}
+
+    @classmethod
+    def from_file(cls, path):
+        mapping = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split("#", 1)[0].split()
+                if len(parts) < 2:
+                    continue
+                for host in parts[1:]:
+                    mapping.setdefault(host.lower(), []).append(parts[0])
+        return cls(mapping)
+
+    def __call__(self, host):
+        addresses = self.mapping.get(host.lower(), ["NXDOMAIN"])
+        if "NXDOMAIN" in addresses:
+            raise socket.gaierror(getattr(socket, "EAI_NONAME", -2), f"stub: NXDOMAIN {host}")
+        if "NODATA" in addresses:
+            raise socket.gaierror(getattr(socket, "EAI_NODATA", -5), f"stub: no address for {host}")
+        return list(addresses)
+
+class DNSCache:
+    """
+    跨執行、跨模式共用的 DNS 解析快取（SQLite，多個 web_capture 程序可同時讀寫）：
+      - live 的結果保存 ttl_hours
+      - nxdomain / noaddr 保存 negative_ttl_hours（釣魚網域可能稍後才生效，時間較短）
+      - error 不快取
+    """
+    def __init__(self, path, ttl_hours=6, negative_ttl_hours=1):
+        self.ttl_seconds = ttl_hours * 3600
+        self.negative_ttl_seconds = negative_ttl_hours * 3600
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                addresses TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )""")
+        self.conn.commit()
+
+    def get(self, host):
+        """回傳未過期的 DNSStatus（cached=True），沒有或已過期時回傳 None。"""
+        with self.lock:
+            row = self.conn.execute("SELECT status, addresses, resolved_at FROM hosts WHERE host = ?",
+                                    (host,)).fetchone()
+        if not row:
+            return None
+        status, addresses, resolved_at = row
+        ttl = self.negative_ttl_seconds if status in DEAD_STATUSES else self.ttl_seconds
+        if time.time() - resolved_at > ttl:
+            return None
+        return DNSStatus(host, status, json.loads(addresses), cached=True)
+
+    def put(self, status):
+        if status.status == "error":
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO hosts (host, status, addresses, resolved_at) VALUES (?, ?, ?, ?)",
+                (status.host, status.status, json.dumps(status.addresses), time.time()))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class DNSPreResolver:
+    """
+    擷取前的批次 DNS 預解析：以有上限的執行緒池同時解析所有主機，
+    每個查詢最多等待 timeout 秒（getaddrinfo 本身沒有逾時設定，逾時的查詢留在背景結束）。
+    resolver 可替換為 StubResolver 等任何「主機 → 位址 list」的 callable，方便離線測試。
+    """
+    def __init__(self, cache=None, max_workers=32, timeout=5, resolver=None):
+        self.cache = cache
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.resolver = resolver or system_resolver
+        self.cache_hits = 0
+
+    def _lookup(self, host):
+        holder = {}
+
+        def target():
+            try:
+                holder["addresses"] = self.resolver(host)
+            except Exception as e:
+                holder["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise TimeoutError(f"DNS lookup for {host} timed out after {self.timeout}s")
+        if "error" in holder:
+            raise holder["error"]
+        return holder["addresses"]
+
+    def resolve(self, host):
+        start = time.time()
+        try:
+            addresses = self._lookup(host)
+        except socket.gaierror as e:
+            if e.errno in NXDOMAIN_ERRNOS:
+                status = "nxdomain"
+            elif e.errno in NODATA_ERRNOS:
+                status = "noaddr"
+            else:
+                status = "error"
+            return DNSStatus(host, status, elapsed=time.time() - start, error=e)
+        except Exception as e:
+            return DNSStatus(host, "error", elapsed=time.time() - start, error=e)
+        return DNSStatus(host, "live" if addresses else "noaddr", addresses, elapsed=time.time() - start)
+
+    def run(self, hosts):
+        """回傳 {host: DNSStatus}；IP 位址直接視為 live，快取命中的主機不再查詢。"""
+        results = {}
+        pending = []
+        for host in dict.fromkeys(h for h in hosts if h):
+            try:
+                ipaddress.ip_address(host)
+                results[host] = DNSStatus(host, "live", [host])
+                continue
+            except ValueError:
+                pass
+            cached = self.cache.get(host) if self.cache else None
+            if cached:
+                self.cache_hits += 1
+                results[host] = cached
+            else:
+                pending.append(host)
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+                for status in executor.map(self.resolve, pending):
+                    results[status.host] = status
+                    if self.cache:
+                        self.cache.put(status)
+        return results
@@ -0,0 +1,189 @@
+import os
+import sys
+import csv
+import time
+import argparse
+import functools
+import idna
+from urllib.parse import scheme_chars
+
+PSL_FILE_NAME = "public_suffix_list.dat"
+PRIVATE_SECTION_MARKER = "// ===BEGIN PRIVATE DOMAINS==="
+# trie 節點中表示「此處為一個完整 suffix」的 key（label 都是字串，不會與 None 衝突）
+SUFFIX_END = None
+# 全形與表意文字的句點，與 tldextract 相同視為 "."
+UNICODE_DOTS = ("。", "．", "｡")
+SCHEME_CHARS = set(scheme_chars)
+
+def default_psl_path():
+    """隨程式附帶的 public suffix 快照；PyInstaller 打包後位於解壓暫存資料夾（sys._MEIPASS）。"""
+    base_dir = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, PSL_FILE_NAME)
+
+def load_suffix_trie(path):
+    """
+    讀取 public_suffix_list.dat 的 ICANN 區段（與 tldextract 預設相同，不含 private 網域），
+    建成以反序 label 為路徑的巢狀 dict trie；"*" 與 "!label" 依 PSL 規則保留為一般的 label。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    public_text = text.partition(PRIVATE_SECTION_MARKER)[0]
+    root = {}
+    for line in public_text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("//"):
+            continue
+        node = root
+        for label in reversed(line.split()[0].split(".")):
+            node = node.setdefault(label, {})
+        node[SUFFIX_END] = True
+    return root
+
+def lenient_host(url):
+    """
+    與 tldextract 相同的寬鬆主機名稱解析：容許沒有 scheme 的網址，
+    去掉帳號密碼、port、路徑與結尾的根網域句點，保留大小寫與 IPv6 的中括號。
+    """
+    double_slashes = url.find("//")
+    if double_slashes == 0:
+        url = url[2:]
+    elif double_slashes >= 2 and url[double_slashes - 1] == ":" and not set(url[:double_slashes - 1]) - SCHEME_CHARS:
+        url = url[double_slashes + 2:]
+    authority = url.partition("/")[0].partition("?")[0].partition("#")[0]
+    host = authority.rpartition("@")[-1]
+    if host and host[0] == "[":
+        bracketed = host.partition("]")
+        if bracketed[1] == "]":
+            return f"{bracketed[0]}]"
+    return host.partition(":")[0].strip().rstrip("." + "".join(UNICODE_DOTS))
+
+def decode_label(label):
+    lowered = label.lower()
+    if lowered.startswith("xn--"):
+        try:
+            return idna.decode(lowered)
+        except (UnicodeError, IndexError):
+            pass
+    return lowered
+
+class DomainNormalizer:
+    """
+    離線的網域正規化：以附帶的 public suffix 快照建成 suffix trie，不會嘗試從網路下載，
+    主機名稱的查詢結果以 LRU 快取（同一批通報資料中大量重複的網域只需比對一次）。
+    結果與 tldextract.extract(url).registered_domain 相同。
+    """
+    def __init__(self, psl_path=None, cache_size=65536):
+        self.psl_path = psl_path or default_psl_path()
+        self.trie = load_suffix_trie(self.psl_path)
+        self.host_registered_domain = functools.lru_cache(maxsize=cache_size)(self._host_registered_domain)
+
+    def suffix_index(self, labels):
+        """回傳 public suffix 第一個 label 的位置，沒有符合的 suffix 時回傳 None。"""
+        node = self.trie
+        suffix_index = label_index = len(labels)
+        for label in reversed(labels):
+            decoded = decode_label(label)
+            child = node.get(decoded)
+            if child is not None:
+                label_index -= 1
+                node = child
+                if SUFFIX_END in node:
+                    suffix_index = label_index
+                continue
+            if "*" in node:
+                # 萬用字元規則（*.bd），"!label" 為例外（!www.ck）
+                return label_index if "!" + decoded in node else label_index - 1
+            break
+        return suffix_index if suffix_index != len(labels) else None
+
+    def _host_registered_domain(self, host):
+        for dot in UNICODE_DOTS:
+            host = host.replace(dot, ".")
+        labels = host.split(".")
+        index = self.suffix_index(labels)
+        if not index:
+            return ""
+        domain = labels[index - 1]
+        return f"{domain}.{'.'.join(labels[index:])}" if domain else ""
+
+    def registered_domain(self, url):
+        """回傳註冊網域（例如 https://a.b.example.co.uk/x → example.co.uk），IP、localhost 等回傳空字串。"""
+        return self.host_registered_domain(lenient_host(url))
+
+    def registered_domains(self, urls):
+        """批次 API：一次正規化整個欄位，回傳與輸入等長的 list。"""
+        lookup = self.host_registered_domain
+        return [lookup(lenient_host(url)) for url in urls]
+
+    def cache_info(self):
+        return self.host_registered_domain.cache_info()
+
+@functools.lru_cache(maxsize=None)
+def get_normalizer():
+    """程式共用的 DomainNormalizer，第一次使用時才載入 public suffix 快照。"""
+    return DomainNormalizer()
+
+def registered_domain(url):
+    return get_normalizer().registered_domain(url)
+
+def read_column(csv_file, url_col):
+    with open(csv_file, "r", encoding="utf-8", errors="replace", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [row[url_col] for row in reader if len(row) > url_col]
+
+def benchmark(urls, repeat=3, cache_size=65536):
+    """比較 tldextract（離線快照）與 DomainNormalizer 的每秒處理列數，並確認兩者結果一致。"""
+    import tldextract
+    extract = tldextract.TLDExtract(suffix_list_urls=())
+    extract("example.com")
+    # tldextract 5.3 起 registered_domain 改名為 top_domain_under_public_suffix
+    field = "top_domain_under_public_suffix" if hasattr(extract("example.com"), "top_domain_under_public_suffix") \
+        else "registered_domain"
+
+    def run_tldextract():
+        return [getattr(extract(url), field) for url in urls]
+
+    normalizer = DomainNormalizer(cache_size=cache_size)
+    expected = run_tldextract()
+    mismatches = [(u, e, g) for u, e, g in zip(urls, expected, normalizer.registered_domains(urls)) if e != g]
+
+    results = {}
+    for name, fn in (("tldextract", run_tldextract), ("normalizer", lambda: normalizer.registered_domains(urls))):
+        best = None
+        for _ in range(repeat):
+            # 每次都從空的 LRU 開始，不讓前一次的快取影響結果
+            normalizer.host_registered_domain.cache_clear()
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = len(urls) / best if best else float("inf")
+    return results, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="離線網域正規化：比較與 tldextract 的速度與結果")
+    parser.add_argument("--csv", type=str, required=True, help="要測試的 CSV（例如 total.csv）")
+    parser.add_argument("--url-col", type=int, default=2, help="網址欄的 0-based index，預設為 2 (第 3 欄)")
+    parser.add_argument("--repeat", type=int, default=3, help="每種方式重複執行次數，取最快一次 (預設：3)")
+    parser.add_argument("--scale", type=int, default=1, help="把網址欄重複幾次以模擬大量資料 (預設：1)")
+    args = parser.parse_args()
+
+    urls = read_column(args.csv, args.url_col) * args.scale
+    if not urls:
+        print(f"[錯誤] {args.csv} 沒有可用的網址")
+        sys.exit(1)
+    results, mismatches = benchmark(urls, repeat=args.repeat)
+    print(f"[INFO] {len(urls)} 列，{len(set(urls))} 個不同網址")
+    for name, rate in results.items():
+        print(f"  {name:<12} {rate:>12,.0f} rows/sec")
+    print(f"  加速 {results['normalizer'] / results['tldextract']:.1f} 倍")
+    if mismatches:
+        print(f"[警告] {len(mismatches)} 筆結果與 tldextract 不同：")
+        for url, expected, got in mismatches[:20]:
+            print(f"  {url}: tldextract={expected!r} normalizer={got!r}")
+    else:
+        print("[INFO] 所有結果與 tldextract 相同")
+
+if __name__ == "__main__":
+    main()
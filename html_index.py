@@ -0,0 +1,301 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import multiprocessing
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor
+
+INDEX_FILE_NAME = "html_index.sqlite3"
+# 指標的判斷規則改變時遞增，舊版本的索引會整個重新解析
+INDEX_VERSION = 2
+# 品牌名稱 → 比對用的關鍵字（不分大小寫，比對標題與頁面文字）
+BRAND_KEYWORDS = {
+    "Google": ["google", "gmail"],
+    "Yahoo": ["yahoo", "雅虎"],
+    "Facebook": ["facebook", "臉書"],
+    "Instagram": ["instagram"],
+    "LINE": ["line pay", "line 官方", "line帳號", "line 帳號"],
+    "Apple": ["apple id", "icloud", "apple"],
+    "Microsoft": ["microsoft", "outlook", "office 365", "hotmail"],
+    "PayPal": ["paypal"],
+    "Amazon": ["amazon"],
+    "Netflix": ["netflix"],
+    "DHL": ["dhl"],
+    "蝦皮": ["shopee", "蝦皮"],
+    "momo": ["momo購物", "momoshop"],
+    "PChome": ["pchome"],
+    "中華郵政": ["中華郵政", "郵局", "chunghwa post"],
+    "中華電信": ["中華電信", "cht.com"],
+    "台灣大哥大": ["台灣大哥大", "taiwan mobile"],
+    "遠傳": ["遠傳"],
+    "遠通電收": ["etag", "遠通電收"],
+    "監理服務網": ["監理服務", "監理站", "交通罰單"],
+    "國泰世華": ["國泰世華", "cathay"],
+    "中國信託": ["中國信託", "ctbc"],
+    "玉山銀行": ["玉山銀行", "e.sun", "esun"],
+    "台新銀行": ["台新銀行", "taishin"],
+    "7-ELEVEN": ["7-eleven", "7-11", "統一超商"],
+    "全家": ["全家便利", "familymart"],
+}
+
+def compile_brand_pattern(keywords):
+    """
+    英數關鍵字以單字邊界比對（apple 不會比對到 pineapple、7-11 不會比對到 2017-11-05），
+    含中文的關鍵字沒有單字邊界，維持子字串比對；re.ASCII 讓中文字元也視為邊界（「在7-11購物」仍會比對到）。
+    """
+    parts = [rf"\b{re.escape(k)}\b" if k.isascii() else re.escape(k) for k in keywords]
+    return re.compile("|".join(parts), re.ASCII)
+
+BRAND_PATTERNS = {brand: compile_brand_pattern(keywords) for brand, keywords in BRAND_KEYWORDS.items()}
+# 信用卡欄位：autocomplete 屬性或 name／id／placeholder 中的關鍵字
+CARD_AUTOCOMPLETE = ("cc-number", "cc-csc", "cc-exp", "cc-name")
+CARD_KEYWORDS = ("cardnumber", "card_number", "card-number", "ccnum", "cc_num", "cvv", "cvc", "信用卡", "卡號", "安全碼")
+# 比對品牌時最多保留的頁面文字長度
+MAX_TEXT_CHARS = 200000
+
+class IndicatorParser(HTMLParser):
+    """以標準函式庫的 HTMLParser 逐一掃描標籤，收集標題、表單、外部 script、favicon 與頁面文字。"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.in_title = False
+        self.skip_depth = 0
+        self.form_actions = []
+        self.script_hosts = []
+        self.favicon = None
+        self.has_password = False
+        self.has_card = False
+        self.text = []
+        self.text_chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: (value or "") for name, value in attrs}
+        if tag == "title":
+            self.in_title = True
+        elif tag in ("script", "style"):
+            self.skip_depth += 1
+            host = urlparse(attrs.get("src", "")).hostname if tag == "script" else None
+            if host and host not in self.script_hosts:
+                self.script_hosts.append(host)
+        elif tag == "form":
+            action = attrs.get("action", "").strip()
+            if action not in self.form_actions:
+                self.form_actions.append(action)
+        elif tag == "link":
+            rel = attrs.get("rel", "").lower().split()
+            if "icon" in rel and self.favicon is None:
+                self.favicon = attrs.get("href", "").strip() or None
+        elif tag == "input":
+            if attrs.get("type", "").lower() == "password":
+                self.has_password = True
+            autocomplete = attrs.get("autocomplete", "").lower()
+            names = " ".join(attrs.get(k, "") for k in ("name", "id", "placeholder")).lower()
+            if autocomplete.startswith(CARD_AUTOCOMPLETE) or any(k in names for k in CARD_KEYWORDS):
+                self.has_card = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        elif tag in ("script", "style") and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif not self.skip_depth and self.text_chars < MAX_TEXT_CHARS:
+            self.text.append(data)
+            self.text_chars += len(data)
+
+def extract_indicators(path):
+    """
+    解析單一 HTML 檔，回傳索引欄位 dict；在 process pool 中執行。
+    檔案統一以 UTF-8 讀取（web_capture 存檔的編碼），無法解碼的位元組以替代字元處理。
+    """
+    stat = os.stat(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        source = f.read()
+    parser = IndicatorParser()
+    try:
+        parser.feed(source)
+        parser.close()
+    except Exception:
+        # 嚴重損毀的 HTML 仍保留解析到目前為止的結果
+        pass
+    title = " ".join(parser.title.split())
+    haystack = (title + " " + " ".join(parser.text)).lower()
+    brands = [brand for brand, pattern in BRAND_PATTERNS.items() if pattern.search(haystack)]
+    return {
+        "path": os.path.abspath(path),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "title": title,
+        "form_actions": parser.form_actions,
+        "script_hosts": parser.script_hosts,
+        "favicon": parser.favicon,
+        "brands": brands,
+        "has_password": parser.has_password,
+        "has_card": parser.has_card,
+    }
+
+class HTMLIndex:
+    """
+    HTML 指標索引（HTML 資料夾中的 html_index.sqlite3）：每個檔案一筆，
+    以檔案大小與修改時間判斷是否需要重新解析，重跑時只處理新增或變更的檔案。
+    """
+    FILE_NAME = INDEX_FILE_NAME
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                form_actions TEXT NOT NULL,
+                script_hosts TEXT NOT NULL,
+                favicon TEXT,
+                brands TEXT NOT NULL,
+                has_password INTEGER NOT NULL,
+                has_card INTEGER NOT NULL,
+                indexed_at REAL NOT NULL
+            )""")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+            self.conn.execute("DELETE FROM pages")
+            self.conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.conn.commit()
+
+    def known(self):
+        """回傳 {path: (mtime, size)}，用來判斷哪些檔案不需重新解析。"""
+        return {path: (mtime, size) for path, mtime, size in self.conn.execute("SELECT path, mtime, size FROM pages")}
+
+    def put_many(self, entries):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO pages (path, mtime, size, title, form_actions, script_hosts, favicon, brands, "
+            "has_password, has_card, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(e["path"], e["mtime"], e["size"], e["title"],
+              json.dumps(e["form_actions"], ensure_ascii=False), json.dumps(e["script_hosts"], ensure_ascii=False),
+              e["favicon"], json.dumps(e["brands"], ensure_ascii=False),
+              int(e["has_password"]), int(e["has_card"]), time.time()) for e in entries])
+        self.conn.commit()
+
+    def remove(self, paths):
+        self.conn.executemany("DELETE FROM pages WHERE path = ?", [(p,) for p in paths])
+        self.conn.commit()
+
+    def entries(self):
+        cursor = self.conn.execute(
+            "SELECT path, title, form_actions, script_hosts, favicon, brands, has_password, has_card "
+            "FROM pages ORDER BY path")
+        for path, title, actions, hosts, favicon, brands, has_password, has_card in cursor:
+            yield {
+                "path": path,
+                "title": title,
+                "form_actions": json.loads(actions),
+                "script_hosts": json.loads(hosts),
+                "favicon": favicon,
+                "brands": json.loads(brands),
+                "has_password": bool(has_password),
+                "has_card": bool(has_card),
+            }
+
+    def close(self):
+        self.conn.close()
+
+def build_index(html_dir, workers=None, batch_size=200, log=print):
+    """
+    平行解析 html_dir 中的 .html 檔並更新索引；已索引且大小、修改時間未變的檔案直接略過，
+    已刪除的檔案從索引移除。回傳 (解析數, 略過數, 失敗數)。
+    """
+    index = HTMLIndex(os.path.join(html_dir, INDEX_FILE_NAME))
+    try:
+        known = index.known()
+        paths = []
+        present = set()
+        for name in sorted(os.listdir(html_dir)):
+            if not name.lower().endswith((".html", ".htm")):
+                continue
+            path = os.path.abspath(os.path.join(html_dir, name))
+            present.add(path)
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_mtime, stat.st_size):
+                paths.append(path)
+        stale = [path for path in known if path not in present]
+        if stale:
+            index.remove(stale)
+
+        skipped = len(present) - len(paths)
+        failed = 0
+        start = time.time()
+        if paths:
+            workers = workers or os.cpu_count() or 1
+            batch = []
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+                futures = [executor.submit(extract_indicators, path) for path in paths]
+                for path, future in zip(paths, futures):
+                    try:
+                        batch.append(future.result())
+                    except Exception as e:
+                        failed += 1
+                        log(f"[html_index][錯誤] {path}: {e}")
+                    if len(batch) >= batch_size:
+                        index.put_many(batch)
+                        batch = []
+            if batch:
+                index.put_many(batch)
+        log(f"[html_index] {html_dir}：解析 {len(paths) - failed} 個檔案，略過未變更 {skipped} 個，"
+            f"失敗 {failed} 個，耗時 {time.time() - start:.1f} 秒")
+        return len(paths) - failed, skipped, failed
+    finally:
+        index.close()
+
+def export_jsonl(html_dirs, output_path):
+    """把各資料夾的索引合併輸出為 JSONL，一行一個檔案。"""
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for html_dir in html_dirs:
+            index = HTMLIndex(os.path.join(html_dir, INDEX_FILE_NAME))
+            for entry in index.entries():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                count += 1
+            index.close()
+    return count
+
+def find_html_dirs(paths):
+    """參數可以是 HTML 資料夾或上層資料夾（例如整個 CyberTrackerOutput），遞迴找出含有 .html 檔的資料夾。"""
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            print(f"[警告] 找不到資料夾：{path}")
+            continue
+        for root, _, files in os.walk(path):
+            if any(name.lower().endswith((".html", ".htm")) for name in files):
+                found.append(root)
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="建立已存檔 HTML 的指標索引（標題、表單目標、外部 script、favicon、品牌、密碼與信用卡欄位）")
+    parser.add_argument("paths", nargs="+", help="HTML 資料夾或其上層資料夾，可指定多個")
+    parser.add_argument("--workers", type=int, default=None, help="解析用的 process 數 (預設：CPU 核心數)")
+    parser.add_argument("--jsonl", type=str, default=None, help="另將索引合併輸出為 JSONL 檔")
+    args = parser.parse_args()
+
+    html_dirs = find_html_dirs(args.paths)
+    if not html_dirs:
+        print("[錯誤] 沒有找到任何 HTML 檔")
+        sys.exit(1)
+    for html_dir in html_dirs:
+        build_index(html_dir, workers=args.workers)
+    if args.jsonl:
+        count = export_jsonl(html_dirs, args.jsonl)
+        print(f"[INFO] 已輸出 {count} 筆索引至 {args.jsonl}")
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -1,21 +1,142 @@
 import os
 import sys
 import csv
+import time
 import argparse
+import contextlib
+import collections
+import multiprocessing
 import chardet
-import tldextract
 from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor
+from domain_normalizer import registered_domain
+from report_history import (ReportHistory, history_key, history_domain,
+                            REPORT_DATE_COLUMN, STOP_DATE_COLUMN, MARK_COLUMN)
 
 def extract_main_domain(url: str) -> str:
     """
-    使用 tldextract 精準抽取主網域:
+    依附帶的 public suffix 快照抽取主網域（離線、結果有 LRU 快取，與 tldextract 相同）:
       - 例如：輸入 "https://en.wikipedia.org"，輸出 "wikipedia.org"
     """
-    ext = tldextract.extract(url)
-    domain = ext.registered_domain
+    domain = registered_domain(url)
     return domain.lower() if domain else url
 
-def merge_csv(input_dir: str, output_file: str, url_col: int = 2):
+def detect_encoding(file_path: str) -> str:
+    # 偵測檔案編碼 (讀取前 2KB)
+    with open(file_path, "rb") as rb:
+        raw_data = rb.read(2048)
+    return chardet.detect(raw_data)["encoding"] or "utf-8"
+
+def parse_input_file(file_path: str, url_col: int = 2, with_domain: bool = False):
+    """
+    在 process pool 中讀取單一檔案：偵測編碼並解析全部的列，回傳 dict
+    （header、rows、domain_urls、count、encoding、seconds、error）；讀取失敗時保留失敗前已解析的列。
+    count 為讀到的有效列數（去除重複前），與逐檔串流模式的統計相同。
+    同一檔案中重複的網址只保留第一筆（合併時後面的重複列本來就會被略過），減少傳回主程序的資料量；
+    with_domain 時一併算好每列 domain.csv 的網址，主網域轉換也分散到各 worker。
+    """
+    start = time.time()
+    enc = detect_encoding(file_path)
+    header = None
+    rows = []
+    seen_urls = set()
+    count = 0
+    error = None
+    try:
+        with open(file_path, "r", encoding=enc, errors="replace") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header:
+                for row in reader:
+                    if len(row) <= url_col:
+                        continue
+                    count += 1
+                    current_url = row[url_col].strip()
+                    if current_url in seen_urls:
+                        continue
+                    seen_urls.add(current_url)
+                    rows.append(row)
+    except Exception as e:
+        # 以字串傳回，避免無法 pickle 的例外中斷整個 pool
+        error = str(e)
+    domain_urls = [to_domain_url(row[url_col]) for row in rows] if with_domain else None
+    return {"header": header, "rows": rows, "domain_urls": domain_urls, "count": count, "encoding": enc,
+            "seconds": time.time() - start, "error": error}
+
+def iter_parsed_files(input_dir: str, all_files, url_col: int = 2, jobs: int = 2, with_domain: bool = False):
+    """
+    以 process pool 平行解析檔案，依檔名排序逐一產生 (file_name, 解析結果)。
+    同時送出的檔案數限制在 jobs 的兩倍，已解析但尚未寫出的資料不會無限制累積。
+    """
+    files = sorted(all_files)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        next_file = 0
+        while pending or next_file < len(files):
+            while next_file < len(files) and len(pending) < jobs * 2:
+                file_path = os.path.join(input_dir, files[next_file])
+                pending.append((files[next_file], executor.submit(parse_input_file, file_path, url_col, with_domain)))
+                next_file += 1
+            file_name, future = pending.popleft()
+            yield file_name, future.result()
+
+def iter_input_rows(input_dir: str, all_files, url_col: int = 2, jobs: int = 1, timings=None, with_domain=False):
+    """
+    依檔名排序逐檔讀取，逐列產生 (file_header, row, domain_url)；每個檔案的第一列為 file_header（row 為 None），
+    沒有表頭的空檔案直接略過，欄位數不足、取不到網址欄的列也略過。
+    讀取失敗時印出錯誤並繼續下一個檔案（失敗前已產生的列仍然有效）。
+    jobs 大於 1 時改由 process pool 平行偵測編碼與解析，產生的列與順序完全相同；
+    with_domain 時 worker 先算好 domain.csv 的網址，逐檔串流模式的 domain_url 則為 None，由呼叫端自行轉換。
+    timings 為 list 時，每個檔案附加一筆 (檔名, 編碼, 列數, 秒數)。
+    """
+    if jobs > 1:
+        for file_name, parsed in iter_parsed_files(input_dir, all_files, url_col, jobs, with_domain):
+            if timings is not None:
+                timings.append((file_name, parsed["encoding"], parsed["count"], parsed["seconds"]))
+            if parsed["header"]:
+                yield parsed["header"], None, None
+                domain_urls = parsed["domain_urls"] or [None] * len(parsed["rows"])
+                for row, domain_url in zip(parsed["rows"], domain_urls):
+                    yield parsed["header"], row, domain_url
+            if parsed["error"] is not None:
+                print(f"[錯誤] 讀取 {file_name} 失敗：{parsed['error']}")
+        return
+
+    for file_name in sorted(all_files):
+        file_path = os.path.join(input_dir, file_name)
+        start = time.time()
+        count = 0
+        enc = detect_encoding(file_path)
+
+        try:
+            with open(file_path, "r", encoding=enc, errors="replace") as f:
+                reader = csv.reader(f)
+                file_header = next(reader, None)
+                if not file_header:
+                    continue
+                yield file_header, None, None
+                for row in reader:
+                    if len(row) <= url_col:
+                        continue
+                    count += 1
+                    yield file_header, row, None
+        except Exception as e:
+            print(f"[錯誤] 讀取 {file_name} 失敗：{e}")
+        finally:
+            if timings is not None:
+                timings.append((file_name, enc, count, time.time() - start))
+
+def to_domain_url(url: str) -> str:
+    """domain.csv 的網址欄：轉換成主網域，並補上 https://（沒有 www. 時加上 www.）。"""
+    main_dom = extract_main_domain(url)
+    if not main_dom:
+        return ""
+    if not main_dom.startswith("www."):
+        return f"https://www.{main_dom}"
+    return f"https://{main_dom}"
+
+def merge_csv(input_dir: str, output_file: str, url_col: int = 2, domain_output: str = None,
+              history_path: str = None, history_mode: str = "mark", history_by: str = "url", jobs: int = 1):
     """
     合併 input_dir 下所有 CSV 檔案，並輸出至 output_file。
     流程：
@@ -25,6 +146,18 @@ def merge_csv(input_dir: str, output_file: str, url_col: int = 2):
       4. 若輸出檔名包含 domain.csv，則將網址欄轉換成主網域，並自動補上 https:// 前綴。
       
     注意：其他欄位保持不變，欄位結構與原始格式相同。
+    以串流方式邊讀邊寫，記憶體中只保留去重用的網址 set；
+    先寫入同資料夾的暫存檔，完成後才取代 output_file，失敗時不會留下寫到一半的檔案。
+    指定 domain_output 時，同一次讀取同時輸出 domain.csv 格式的檔案（內容與另外執行一次相同）。
+
+    指定 history_path 時，依跨日的通報歷史處理之前已通報過的網址（history_by 為 url 或 domain）：
+      - mark：保留並在最後附加「歷史通報日期」欄（第一次通報的日期，未通報過為空白）
+      - drop：直接略過，不列入編號
+      - recheck：只保留已通報過的網址，並帶入已記錄的停止解析日期，供複查是否已停止解析
+    本次輸出的網址在全部寫入成功後才記錄到歷史中；被 drop／recheck 略過的列不新增紀錄，
+    已在歷史中的網址只更新最後出現日期。
+
+    jobs 大於 1 時以 process pool 平行偵測編碼與解析各檔案，再依檔名順序合併，去重與編號結果不變。
     """
     if not os.path.isdir(input_dir):
         print(f"[警告] 找不到資料夾：{input_dir}")
@@ -35,94 +168,151 @@ def merge_csv(input_dir: str, output_file: str, url_col: int = 2):
         print(f"[警告] {input_dir} 中沒有任何 CSV 檔案。")
         sys.exit(1)
 
+    # (輸出檔, 是否轉換為主網域)
+    outputs = [(output_file, "domain.csv" in os.path.basename(output_file).lower())]
+    if domain_output:
+        outputs.append((domain_output, True))
+    tmp_files = [f"{path}.{os.getpid()}.tmp" for path, _ in outputs]
     seen_urls = set()
-    merged_rows = []
     header_saved = False
-    header = None
+    count = 0
+    history = ReportHistory(history_path) if history_path else None
+    history_hits = 0
+    report_col = stop_col = None
+    header_len = 0
+    timings = []
+    start = time.time()
 
-    # 依檔名排序處理，避免隨機順序
-    for file_name in sorted(all_files):
-        file_path = os.path.join(input_dir, file_name)
-        # 偵測檔案編碼 (讀取前 2KB)
-        with open(file_path, "rb") as rb:
-            raw_data = rb.read(2048)
-        enc = chardet.detect(raw_data)["encoding"] or "utf-8"
+    def discard_tmp_files():
+        for tmp_file in tmp_files:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        if history:
+            history.rollback()
+            history.close()
 
-        try:
-            with open(file_path, "r", encoding=enc, errors="replace") as f:
-                reader = csv.reader(f)
-                file_header = next(reader, None)
-                if not file_header:
-                    continue
+    try:
+        with contextlib.ExitStack() as stack:
+            writers = []
+            for (path, to_domain), tmp_file in zip(outputs, tmp_files):
+                # 確保目錄存在
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                fout = stack.enter_context(open(tmp_file, "w", encoding="utf-8", newline=""))
+                writers.append((csv.writer(fout), to_domain))
 
-                # 只在第一個檔保留表頭
-                if not header_saved:
-                    header = file_header
-                    merged_rows.append(file_header)
-                    header_saved = True
+            rows = iter_input_rows(input_dir, all_files, url_col, jobs=jobs, timings=timings,
+                                   with_domain=any(to_domain for _, to_domain in outputs))
+            for file_header, row, domain_url in rows:
+                if row is None:
+                    # 只在第一個檔保留表頭
+                    if not header_saved:
+                        if history:
+                            report_col = file_header.index(REPORT_DATE_COLUMN) if REPORT_DATE_COLUMN in file_header else None
+                            stop_col = file_header.index(STOP_DATE_COLUMN) if STOP_DATE_COLUMN in file_header else None
+                            header_len = len(file_header)
+                            if history_mode == "mark":
+                                file_header = file_header + [MARK_COLUMN]
+                        for writer, _ in writers:
+                            writer.writerow(file_header)
+                        header_saved = True
+                    continue
+                current_url = row[url_col].strip()
+                if current_url in seen_urls:
+                    continue
+                seen_urls.add(current_url)
 
-                for row in reader:
-                    if len(row) <= url_col:
+                if history:
+                    key = history_key(current_url)
+                    domain = history_domain(current_url)
+                    previous = history.previous(key, domain, by=history_by)
+                    report_date = row[report_col].strip() if report_col is not None and len(row) > report_col else ""
+                    if previous:
+                        history_hits += 1
+                    if (history_mode == "drop" and previous) or (history_mode == "recheck" and not previous):
+                        # 沒有輸出的列不算通報：不新增紀錄，已有紀錄的網址仍更新最後出現日期
+                        history.touch(key)
                         continue
-                    current_url = row[url_col].strip()
-                    if current_url in seen_urls:
-                        continue
-                    seen_urls.add(current_url)
-                    merged_rows.append(row)
-        except Exception as e:
-            print(f"[錯誤] 讀取 {file_name} 失敗：{e}")
+                    # 寫入輸出的列：新網址新增紀錄，已有的網址只更新最後出現日期
+                    history.record(key, domain, report_date)
+                    if history_mode == "mark":
+                        # 補齊到表頭欄數，讓標記欄對齊在最後一欄
+                        row = row + [""] * (header_len - len(row)) + [previous[0] if previous else ""]
+                    elif history_mode == "recheck" and stop_col is not None and previous[2]:
+                        if len(row) > stop_col and not row[stop_col].strip():
+                            row[stop_col] = previous[2]
 
-    if len(merged_rows) < 2:
-        print("[警告] 合併後沒有有效資料。")
+                # 重新編號：假設第一欄 (index=0) 為編號
+                count += 1
+                row[0] = str(count)
+                for writer, to_domain in writers:
+                    # domain.csv 修改網址欄 (保留其他欄位不變)
+                    if to_domain:
+                        domain_row = list(row)
+                        domain_row[url_col] = domain_url if domain_url is not None else to_domain_url(row[url_col])
+                        writer.writerow(domain_row)
+                    else:
+                        writer.writerow(row)
+    except Exception as e:
+        print(f"[錯誤] 寫入 {', '.join(path for path, _ in outputs)} 失敗：{e}")
+        discard_tmp_files()
         sys.exit(1)
 
-    # 重新編號：假設第一欄 (index=0) 為編號
-    data_rows = merged_rows[1:]
-    for i, row in enumerate(data_rows, start=1):
-        row[0] = str(i)
-
-    final_rows = [merged_rows[0]] + data_rows
-
-    # 如果輸出檔名含有 domain.csv，就修改網址欄 (保留其他欄位不變)
-    if "domain.csv" in os.path.basename(output_file).lower():
-        for row in final_rows[1:]:
-            original_url = row[url_col]
-            main_dom = extract_main_domain(original_url)
-            if main_dom:
-                if not main_dom.startswith("www."):
-                    row[url_col] = f"https://www.{main_dom}"
-                else:
-                    row[url_col] = f"https://{main_dom}"
-            else:
-                row[url_col] = ""
-
-
-    # 確保目錄存在
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    try:
-        with open(output_file, "w", encoding="utf-8", newline="") as fout:
-            writer = csv.writer(fout)
-            for row in final_rows:
-                writer.writerow(row)
-        print(f"[INFO] 成功輸出：{output_file}")
-    except Exception as e:
-        print(f"[錯誤] 寫入 {output_file} 失敗：{e}")
+    if count == 0:
+        discard_tmp_files()
+        print("[警告] 合併後沒有有效資料。")
         sys.exit(1)
 
+    for (path, _), tmp_file in zip(outputs, tmp_files):
+        try:
+            os.replace(tmp_file, path)
+            print(f"[INFO] 成功輸出：{path}")
+        except Exception as e:
+            discard_tmp_files()
+            print(f"[錯誤] 寫入 {path} 失敗：{e}")
+            sys.exit(1)
+
+    # 各檔案的讀取耗時（平行模式為 worker 中偵測編碼與解析的時間）
+    for file_name, enc, rows, seconds in timings:
+        print(f"[INFO]   {file_name}（{enc}）：{rows} 列，{seconds:.2f} 秒")
+    print(f"[INFO] 讀取 {len(timings)} 個檔案、輸出 {count} 筆，jobs={jobs}，總耗時 {time.time() - start:.2f} 秒")
+
+    if history:
+        history.commit()
+        history.close()
+        action = {"mark": "已標記", "drop": "已略過", "recheck": "保留複查"}[history_mode]
+        print(f"[INFO] 通報歷史：{history_hits} 筆之前已通報（{action}），歷史紀錄：{history_path}")
+
 def main():
     parser = argparse.ArgumentParser(
-        description="合併多個 CSV（依據指定的網址欄去重並重新編號），輸出 total.csv 或 domain.csv。"
+        description="合併多個 CSV（依據指定的網址欄去重並重新編號），輸出 total.csv、domain.csv 或一次輸出兩者。"
     )
     parser.add_argument("--input-dir", required=True, help="CSV 檔案來源資料夾")
     parser.add_argument("--output-file", required=True, help="合併後輸出的 CSV 檔案完整路徑")
+    parser.add_argument("--domain-output", default=None,
+                        help="同時輸出網址欄轉為主網域的 domain.csv 完整路徑（與 --output-file 共用同一次讀取）")
     parser.add_argument("--url-col", type=int, default=2, help="網址欄的 0-based index，預設為 2 (第 3 欄)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="平行偵測編碼與解析 CSV 的 process 數，1 表示逐檔串流讀取 (預設：1)")
+    parser.add_argument("--history", default=None,
+                        help="跨日通報歷史的 SQLite 檔（例如 ./report_history.sqlite3），不指定則不比對歷史")
+    parser.add_argument("--history-mode", choices=["mark", "drop", "recheck"], default="mark",
+                        help="之前已通報網址的處理方式：mark 附加「歷史通報日期」欄、drop 略過、"
+                             "recheck 只保留已通報網址並帶入停止解析日期 (預設：mark)")
+    parser.add_argument("--history-by", choices=["url", "domain"], default="url",
+                        help="比對歷史的依據：正規化網址或註冊網域 (預設：url)")
     args = parser.parse_args()
 
     merge_csv(
         input_dir=args.input_dir,
         output_file=args.output_file,
-        url_col=args.url_col
+        url_col=args.url_col,
+        domain_output=args.domain_output,
+        history_path=args.history,
+        history_mode=args.history_mode,
+        history_by=args.history_by,
+        jobs=max(1, args.jobs)
     )
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,166 @@
+import os
+import sys
+import csv
+import sqlite3
+import argparse
+import datetime
+import chardet
+from capture_cache import normalize_url
+from domain_normalizer import registered_domain, lenient_host
+
+HISTORY_FILE_NAME = "report_history.sqlite3"
+REPORT_DATE_COLUMN = "接獲通報日期"
+STOP_DATE_COLUMN = "停止解析日期"
+# mark 模式附加在最後一欄的欄名
+MARK_COLUMN = "歷史通報日期"
+
+def history_key(url):
+    """
+    歷史紀錄的網址 key：沿用擷取快取的網址正規化，並去掉 scheme，
+    http 與 https、有無 scheme 的同一網址視為同一筆。
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = f"http://{url}"
+    return normalize_url(url).split("://", 1)[1]
+
+def history_domain(url):
+    """註冊網域（小寫），無法解析時（IP、內部主機名稱）退回主機名稱。"""
+    return (registered_domain(url.strip()) or lenient_host(url.strip())).lower()
+
+class ReportHistory:
+    """
+    跨日的通報歷史（SQLite）：每個正規化網址一筆，記錄註冊網域、第一次與最後一次出現的日期、
+    通報日期與停止解析日期。網址為 WITHOUT ROWID 表的主鍵、網域另有索引，
+    數百萬筆歷史資料下單筆查詢仍只需一次 B-tree 搜尋。
+    today 之前第一次出現的網址才算「已通報」，同一天重跑 merge_csv 不會把自己剛寫入的資料當成舊資料。
+    """
+    def __init__(self, path, today=None):
+        self.path = path
+        self.today = today or datetime.date.today().isoformat()
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                report_date TEXT NOT NULL,
+                stop_date TEXT
+            ) WITHOUT ROWID""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_urls_domain ON urls (domain, first_seen)")
+        self.conn.commit()
+
+    def previous(self, url_key, domain, by="url"):
+        """
+        回傳 today 之前已通報的紀錄 (first_seen, report_date, stop_date)，沒有時回傳 None。
+        by="domain" 時以註冊網域比對，回傳該網域最早的一筆。
+        """
+        if by == "domain":
+            row = self.conn.execute(
+                "SELECT first_seen, report_date, stop_date FROM urls WHERE domain = ? AND first_seen < ? "
+                "ORDER BY first_seen LIMIT 1", (domain, self.today)).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT first_seen, report_date, stop_date FROM urls WHERE url = ? AND first_seen < ?",
+                (url_key, self.today)).fetchone()
+        return row
+
+    def record(self, url_key, domain, report_date=""):
+        """新增網址或更新最後出現日期；寫入在 commit() 前都屬於同一個交易。"""
+        self.conn.execute(
+            "INSERT INTO urls (url, domain, first_seen, last_seen, report_date) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen",
+            (url_key, domain, self.today, self.today, report_date or self.today))
+
+    def touch(self, url_key):
+        """只更新已存在網址的最後出現日期，不新增紀錄（用於沒有寫入輸出的列）。"""
+        self.conn.execute("UPDATE urls SET last_seen = ? WHERE url = ?", (self.today, url_key))
+
+    def set_stop_date(self, url_key, stop_date):
+        cursor = self.conn.execute("UPDATE urls SET stop_date = ? WHERE url = ?", (stop_date, url_key))
+        return cursor.rowcount
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def stats(self):
+        total, domains, stopped = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT domain), COUNT(stop_date) FROM urls").fetchone()
+        return {"urls": total, "domains": domains, "stopped": stopped}
+
+    def pending_recheck(self):
+        """已通報但尚未記錄停止解析日期的網址，依第一次出現的日期排序。"""
+        return self.conn.execute(
+            "SELECT url, domain, first_seen, report_date FROM urls WHERE stop_date IS NULL AND first_seen < ? "
+            "ORDER BY first_seen, url", (self.today,)).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+def import_stop_dates(history, csv_file, url_col=2):
+    """從填好「停止解析日期」的 CSV（例如複查後的 total.csv）寫回停止解析日期，回傳更新筆數。"""
+    with open(csv_file, "rb") as rb:
+        enc = chardet.detect(rb.read(2048))["encoding"] or "utf-8"
+    updated = 0
+    with open(csv_file, "r", encoding=enc, errors="replace", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        if STOP_DATE_COLUMN not in header:
+            print(f"[錯誤] {csv_file} 沒有「{STOP_DATE_COLUMN}」欄")
+            return 0
+        stop_col = header.index(STOP_DATE_COLUMN)
+        for row in reader:
+            if len(row) <= max(url_col, stop_col) or not row[stop_col].strip():
+                continue
+            updated += history.set_stop_date(history_key(row[url_col]), row[stop_col].strip())
+    history.commit()
+    return updated
+
+def export_recheck(history, output_file):
+    """把尚未停止解析的已通報網址輸出為與 total.csv 相同欄位的 CSV，可直接交給 web_capture 或人工複查。"""
+    header = ["編號", "網站", "網址", "詐騙網站創建日期", "網域", REPORT_DATE_COLUMN, "含子域名", STOP_DATE_COLUMN]
+    rows = history.pending_recheck()
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for number, (url, domain, _, report_date) in enumerate(rows, start=1):
+            writer.writerow([number, "", f"https://{url}", "", domain, report_date, "", ""])
+    return len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="通報歷史紀錄：統計、匯入停止解析日期、輸出待複查清單")
+    parser.add_argument("--history", required=True, help=f"歷史紀錄 SQLite 檔（例如 ./{HISTORY_FILE_NAME}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="顯示歷史紀錄筆數")
+    stops = sub.add_parser("import-stops", help="從填好停止解析日期的 CSV 寫回歷史紀錄")
+    stops.add_argument("--csv", required=True, help="含「停止解析日期」欄的 CSV")
+    stops.add_argument("--url-col", type=int, default=2, help="網址欄的 0-based index，預設為 2 (第 3 欄)")
+    recheck = sub.add_parser("recheck", help="輸出已通報但尚未停止解析的網址 CSV")
+    recheck.add_argument("--output-file", required=True, help="輸出的 CSV 檔案完整路徑")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.history):
+        print(f"[錯誤] 找不到歷史紀錄：{args.history}")
+        sys.exit(1)
+    history = ReportHistory(args.history)
+    try:
+        if args.command == "stats":
+            stats = history.stats()
+            print(f"[INFO] {stats['urls']} 個網址、{stats['domains']} 個網域，其中 {stats['stopped']} 個已停止解析")
+        elif args.command == "import-stops":
+            updated = import_stop_dates(history, args.csv, args.url_col)
+            print(f"[INFO] 已更新 {updated} 筆停止解析日期")
+        else:
+            count = export_recheck(history, args.output_file)
+            print(f"[INFO] 已輸出 {count} 筆待複查網址：{args.output_file}")
+    finally:
+        history.close()
+
+if __name__ == "__main__":
+    main()
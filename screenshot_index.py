@@ -0,0 +1,170 @@
+import os
+import sys
+import csv
+import time
+import sqlite3
+import argparse
+import threading
+from PIL import Image
+
+INDEX_FILE_NAME = "screenshot_index.sqlite3"
+HASH_BITS = 64
+# 整頁截圖只取頂端計算指紋，同一套釣魚網頁的頁面長度不同時仍能歸為一組
+HASH_CROP_HEIGHT = 2000
+
+def dhash(img, hash_size=8):
+    """
+    計算截圖的 difference hash（64 bits 的十六進位字串）：
+    轉灰階並縮成 (hash_size + 1) x hash_size，逐列比較左右相鄰像素的亮度。
+    同一套網頁即使網域、細部文字或壓縮不同，指紋的 Hamming 距離仍很小。
+    """
+    if img.height > HASH_CROP_HEIGHT:
+        img = img.crop((0, 0, img.width, HASH_CROP_HEIGHT))
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+class ScreenshotIndex:
+    """
+    截圖指紋索引（截圖資料夾中的 screenshot_index.sqlite3）：每張截圖一筆，
+    記錄檔案路徑、網址、網域、profile、頁面標題與 dHash，供本程式把相同的釣魚網頁歸為一組。
+    """
+    FILE_NAME = INDEX_FILE_NAME
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                path TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                profile TEXT NOT NULL,
+                title TEXT NOT NULL,
+                phash TEXT NOT NULL,
+                captured_at REAL NOT NULL
+            )""")
+        self.conn.commit()
+
+    def add(self, path, url, domain, profile, title, phash):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO captures (path, url, domain, profile, title, phash, captured_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), url, domain, profile, title or "", phash, time.time()))
+            self.conn.commit()
+
+    def entries(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, url, domain, profile, title, phash FROM captures ORDER BY captured_at").fetchall()
+        keys = ("path", "url", "domain", "profile", "title", "phash")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+def band_slices(max_distance):
+    """
+    把 64 bits 切成 max_distance + 1 段：距離不超過 max_distance 的兩個指紋至少有一段完全相同（鴿籠原理），
+    只需比較同一段落 bucket 內的候選，不必兩兩比對全部截圖。
+    """
+    bands = min(HASH_BITS, max_distance + 1)
+    bounds = [round(i * HASH_BITS / bands) for i in range(bands + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+def group_entries(entries, max_distance=6, by_profile=True):
+    """
+    以 Hamming 距離 bucket 將近似的截圖分組（union-find，距離具傳遞性時會串成同一組）；
+    by_profile 時 laptop 與 mobile 分開分組。回傳依組內張數排序的 list of list。
+    """
+    parent = list(range(len(entries)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    bits = [f"{int(entry['phash'], 16):0{HASH_BITS}b}" for entry in entries]
+    for start, end in band_slices(max_distance):
+        buckets = {}
+        for i, entry in enumerate(entries):
+            key = (entry["profile"] if by_profile else "", start, bits[i][start:end])
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            for pos, i in enumerate(members):
+                for j in members[pos + 1:]:
+                    if find(i) != find(j) and hamming(entries[i]["phash"], entries[j]["phash"]) <= max_distance:
+                        parent[find(j)] = find(i)
+
+    groups = {}
+    for i in range(len(entries)):
+        groups.setdefault(find(i), []).append(entries[i])
+    return sorted(groups.values(), key=lambda g: (-len(g), g[0]["title"]))
+
+def find_index_files(paths):
+    """參數可以是索引檔或資料夾（遞迴尋找 screenshot_index.sqlite3，例如整個 CyberTrackerOutput）。"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                if INDEX_FILE_NAME in files:
+                    found.append(os.path.join(root, INDEX_FILE_NAME))
+        elif os.path.exists(path):
+            found.append(path)
+        else:
+            print(f"[警告] 找不到索引：{path}")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="依截圖指紋將相同的釣魚網頁分組")
+    parser.add_argument("paths", nargs="+", help=f"{INDEX_FILE_NAME} 或包含它的資料夾，可指定多個")
+    parser.add_argument("--max-distance", type=int, default=6,
+                        help="視為同一組的最大 Hamming 距離（64 bits 中不同的位元數）(預設：6)")
+    parser.add_argument("--min-size", type=int, default=2, help="只列出至少幾張截圖的群組 (預設：2)")
+    parser.add_argument("--mix-profiles", action="store_true", help="laptop 與 mobile 截圖一起分組")
+    parser.add_argument("--csv", type=str, default=None,
+                        help="另將分組結果輸出為 CSV（group, size, profile, domain, title, url, path, phash）")
+    args = parser.parse_args()
+
+    index_files = find_index_files(args.paths)
+    if not index_files:
+        print("[錯誤] 沒有可用的截圖索引")
+        sys.exit(1)
+    entries = []
+    for index_file in index_files:
+        index = ScreenshotIndex(index_file)
+        entries.extend(index.entries())
+        index.close()
+
+    groups = group_entries(entries, max_distance=args.max_distance, by_profile=not args.mix_profiles)
+    shown = [g for g in groups if len(g) >= args.min_size]
+    print(f"[INFO] {len(index_files)} 個索引、{len(entries)} 張截圖，分為 {len(groups)} 組，"
+          f"其中 {len(shown)} 組至少 {args.min_size} 張")
+    for number, group in enumerate(shown, 1):
+        print(f"\n群組 {number}（{len(group)} 張，{group[0]['profile']}，標題：{group[0]['title']}）")
+        for entry in group:
+            print(f"  {entry['domain']}  {entry['title']}  {entry['url']}")
+
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["group", "size", "profile", "domain", "title", "url", "path", "phash"])
+            for number, group in enumerate(groups, 1):
+                for entry in group:
+                    writer.writerow([number, len(group), entry["profile"], entry["domain"], entry["title"],
+                                     entry["url"], entry["path"], entry["phash"]])
+        print(f"[INFO] 分組結果已輸出至 {args.csv}")
+
+if __name__ == "__main__":
+    main()
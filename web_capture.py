@@ -1,12 +1,37 @@
 import os
+import re
 import sys
+import io
+import html
 import csv
+import math
+import base64
+import json
+import functools
+import contextlib
+import collections
+import heapq
+import weakref
 import time
 import argparse
+import threading
+import multiprocessing
 import requests
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, InvalidSessionIdException
+from urllib3.exceptions import HTTPError as Urllib3Error
 from PIL import Image, ImageDraw, ImageFont
+from capture_cache import CaptureCache, link_or_copy, normalize_url
+from dns_cache import DNSCache, DNSPreResolver, StubResolver
+from screenshot_index import ScreenshotIndex, dhash
+from html_index import build_index
+from domain_normalizer import get_normalizer
 
 # 自訂例外與其他輔助函式保持不變
 class FacebookPagesException(Exception):
@@ -24,11 +49,20 @@ class FacebookPagesException(Exception):
                 f.write(url + "\n")
 
 class HTTPStatusError(Exception):
-    def __init__(self, url, status_code):
+    def __init__(self, url, status_code, retry_after=None):
         self.url = url
         self.status_code = status_code
+        # 503 回應的 Retry-After 秒數，延後重試與網域限速會以此為下限
+        self.retry_after = retry_after
         super().__init__(f"HTTP error {status_code} for URL: {url}")
 
+class DNSResolutionError(Exception):
+    def __init__(self, url, host, status):
+        self.url = url
+        self.host = host
+        self.status = status
+        super().__init__(f"DNS resolution failed ({status}) for host {host}: {url}")
+
 def safe_filename(name):
     for ch in r'\/:*?"<>|':
         name = name.replace(ch, "_")
@@ -36,143 +70,1134 @@ def safe_filename(name):
 
 MOBILE_EMULATION = {"deviceName": "Pixel 2"}
 
-MOBILE_EMULATION = {"deviceName": "Pixel 2"}
+def build_chrome_options(headless=True, is_mobile=False, window_width=1280, window_height=2000):
+    options = Options()
+    if headless:
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+    if is_mobile:
+        options.add_experimental_option("mobileEmulation", MOBILE_EMULATION)
+    else:
+        options.add_argument(f"--window-size={window_width},{window_height}")
+    return options
 
-def add_url_banner(screenshot_path, url, banner_height=50, banner_color="#f0f0f0", text_color="#000"):
+def build_base_filename(domain, page_title, is_domain_csv, captured_at=None):
+    """
+    依既有命名規則產生輸出檔名主體（不含副檔名）：
+      - total.csv：{MMDDHHMM}_{網域}_{標題}
+      - domain.csv：{MMDDHHMM}_1_{網域}_{標題}
+    captured_at 為實際擷取的時間（epoch 秒），預設為現在；快取命中時使用原始擷取時間。
+    """
+    timestamp = time.strftime("%m%d%H%M", time.localtime(captured_at))
+    safe_dom = safe_filename(domain)
+    safe_tit = safe_filename(page_title)
+    if is_domain_csv:
+        return f"{timestamp}_1_{safe_dom}_{safe_tit}"
+    return f"{timestamp}_{safe_dom}_{safe_tit}"
+
+@functools.lru_cache(maxsize=None)
+def load_banner_font(size=20):
+    """橫幅字型只載入一次，之後各張截圖共用。"""
     try:
-        img = Image.open(screenshot_path)
-        width, height = img.size
-        new_img = Image.new('RGB', (width, height + banner_height), color=banner_color)
-        new_img.paste(img, (0, banner_height))
-        draw = ImageDraw.Draw(new_img)
-        try:
-            font = ImageFont.truetype("arial.ttf", 20)
-        except IOError:
-            font = ImageFont.load_default()
-        text_x = 10
-        text_y = (banner_height - 20) // 2
-        draw.text((text_x, text_y), url, fill=text_color, font=font)
-        new_img.save(screenshot_path)
-        print(f"已加入 URL 橫幅，檔案更新為：{screenshot_path}")
-    except Exception as e:
-        print(f"[add_url_banner][錯誤] {str(e)}")
+        return ImageFont.truetype("arial.ttf", size)
+    except IOError:
+        return ImageFont.load_default()
+
+def compose_url_banner(img, url, banner_height=50, banner_color="#f0f0f0", text_color="#000"):
+    """在截圖上方加一條寫有 URL 的橫幅，回傳新的 Image。"""
+    width, height = img.size
+    new_img = Image.new('RGB', (width, height + banner_height), color=banner_color)
+    new_img.paste(img, (0, banner_height))
+    draw = ImageDraw.Draw(new_img)
+    text_x = 10
+    text_y = (banner_height - 20) // 2
+    draw.text((text_x, text_y), url, fill=text_color, font=load_banner_font(20))
+    return new_img
+
+def capture_full_page(driver, max_height=16000, tile_height=4000):
+    """
+    以 CDP Page.captureScreenshot（captureBeyondViewport + clip）擷取整頁，不需把視窗開到頁面高度。
+    頁面高度依 Page.getLayoutMetrics 取得，超過 max_height 的部分截斷；
+    較高的頁面分成 tile_height 的多段擷取，回傳各段 PNG bytes 的 list，由 stitch_tiles 組合。
+    寬度不超過視窗寬度：有超寬元素溢出的頁面不會產生過大的圖片（PIL 的 DecompressionBombError）。
+    max_height 與 tile_height 為 CSS px，輸出圖片的像素為其 devicePixelRatio 倍（mobile 為 2.625 倍）。
+    """
+    metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    content = metrics.get("cssContentSize") or metrics["contentSize"]
+    viewport = metrics.get("cssLayoutViewport") or metrics.get("layoutViewport") or {}
+    width = math.ceil(content["width"])
+    if viewport.get("clientWidth"):
+        width = min(width, math.ceil(viewport["clientWidth"]))
+    width = max(1, width)
+    height = max(1, min(math.ceil(content["height"]), max_height))
+    tiles = []
+    for top in range(0, height, tile_height):
+        clip = {"x": 0, "y": top, "width": width, "height": min(tile_height, height - top), "scale": 1}
+        data = driver.execute_cdp_cmd("Page.captureScreenshot",
+                                      {"format": "png", "captureBeyondViewport": True, "clip": clip})
+        tiles.append(base64.b64decode(data["data"]))
+    return tiles
+
+def stitch_tiles(png_tiles):
+    """
+    依序把分段截圖貼到同一張畫布上。Image.open 只讀標頭即可得知尺寸，
+    貼上時一次只解碼一段，記憶體用量約為最終圖片加上一段 tile。
+    """
+    sizes = []
+    for tile in png_tiles:
+        with Image.open(io.BytesIO(tile)) as img:
+            sizes.append(img.size)
+    canvas = Image.new("RGB", (max(w for w, _ in sizes), sum(h for _, h in sizes)), "white")
+    top = 0
+    for tile, (_, h) in zip(png_tiles, sizes):
+        with Image.open(io.BytesIO(tile)) as img:
+            canvas.paste(img, (0, top))
+        top += h
+    return canvas
+
+# --image-format 對應的副檔名與 PIL 儲存參數
+IMAGE_FORMATS = {
+    "png": ("png", {"format": "PNG"}),
+    "png-optimized": ("png", {"format": "PNG", "optimize": True}),
+    "webp": ("webp", {"format": "WEBP", "lossless": True, "quality": 80, "method": 4}),
+    "jpeg": ("jpg", {"format": "JPEG", "optimize": True, "progressive": True}),
+}
+
+def write_screenshot(png_bytes, url, screenshot_path, image_format="png", jpeg_quality=85,
+                     thumbnail_path=None, thumbnail_width=320):
+    """
+    截圖在記憶體中完成：解碼 driver 回傳的 PNG bytes、加上 URL 橫幅後只編碼寫檔一次。
+    png_bytes 也可以是整頁截圖的分段 list，會先接合再加橫幅。
+    在背景的 process pool 執行，driver 不需等待編碼即可前往下一個網址；
+    回傳訊息、輸出大小與耗時，供每次執行的統計使用；
+    phash 為加橫幅前的頁面指紋，橫幅含網址，加上後同一套網頁的指紋就會不同。
+    """
+    start = time.time()
+    if isinstance(png_bytes, list):
+        source_bytes = sum(len(tile) for tile in png_bytes)
+        img = stitch_tiles(png_bytes)
+        phash = dhash(img)
+        new_img = compose_url_banner(img, url)
+    else:
+        source_bytes = len(png_bytes)
+        with Image.open(io.BytesIO(png_bytes)) as img:
+            phash = dhash(img)
+            new_img = compose_url_banner(img, url)
+    banner_done = time.time()
+    save_options = dict(IMAGE_FORMATS[image_format][1])
+    if image_format == "jpeg":
+        save_options["quality"] = jpeg_quality
+    new_img.save(screenshot_path, **save_options)
+    if thumbnail_path:
+        thumb = new_img.copy()
+        thumb.thumbnail((thumbnail_width, thumbnail_width * 20))
+        thumb.save(thumbnail_path, format="JPEG", quality=70)
+    return {
+        "message": f"已截圖並加入 URL 橫幅: {screenshot_path}",
+        "source_bytes": source_bytes,
+        "bytes": os.path.getsize(screenshot_path),
+        "seconds": time.time() - start,
+        "stages": {"banner": banner_done - start, "write": time.time() - banner_done},
+        "thumbnail": thumbnail_path,
+        "phash": phash,
+    }
+
+MAX_RETRY_AFTER = 120
 
-def get_status_with_retry(url, retries=3, backoff=5):
+def parse_retry_after(value, default=None):
+    """解析 Retry-After 標頭（秒數或 HTTP 日期），回傳需等待的秒數；無法解析時回傳 default。"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+def get_status_with_retry(url, retries=3, backoff=5, session=None, log=print):
+    """
+    HEAD 請求，429/503 與連線失敗時重試。log 用來輸出重試訊息；
+    在預檢執行緒中呼叫時由呼叫端收集訊息，再依列序輸出，避免多個執行緒同時 print 造成訊息交錯。
+    """
+    http = session or requests
     attempt = 0
     while attempt < retries:
         try:
-            r = requests.head(url, timeout=10)
-            if r.status_code == 429:
-                print(f"HTTP 429 encountered for URL {url} (attempt {attempt+1}/{retries}), waiting {backoff} seconds...")
+            r = http.head(url, timeout=10)
+            if r.status_code in (429, 503):
+                # 優先採用伺服器的 Retry-After，沒有時才用固定 backoff
+                wait = min(parse_retry_after(r.headers.get("Retry-After"), backoff), MAX_RETRY_AFTER)
                 attempt += 1
                 if attempt < retries:
-                    time.sleep(backoff)
+                    log(f"HTTP {r.status_code} encountered for URL {url} (attempt {attempt}/{retries}), waiting {wait:.0f} seconds...")
+                    time.sleep(wait)
                     continue
+                log(f"HTTP {r.status_code} encountered for URL {url} (attempt {attempt}/{retries})")
             return r
         except Exception as e:
             attempt += 1
             if attempt < retries:
-                print(f"HTTP HEAD request failed for URL {url} (attempt {attempt}/{retries}), waiting {backoff} seconds...")
+                log(f"HTTP HEAD request failed for URL {url} (attempt {attempt}/{retries}), waiting {backoff} seconds...")
                 time.sleep(backoff)
             else:
                 raise e
-class ScreenshotTaker:
-    def __init__(self, csv_file, output_dir, headless=True, is_mobile=False, window_width=1280, window_height=2000):
-        self.csv_file = csv_file
-        self.output_dir = output_dir
-        self.headless = headless
-        self.is_mobile = is_mobile
 
-        self.options = Options()
-        if self.headless:
-            self.options.add_argument('--headless')
-            self.options.add_argument('--no-sandbox')
-        if self.is_mobile:
-            self.options.add_experimental_option("mobileEmulation", MOBILE_EMULATION)
+def check_url_status(url, session=None, retries=3, log=print):
+    """HEAD 預檢：非 200/429 時拋出 FacebookPagesException 或 HTTPStatusError。"""
+    r = get_status_with_retry(url, retries=retries, backoff=5, session=session, log=log)
+    if r.status_code not in [200, 429]:
+        if "facebook.com" in url.lower():
+            raise FacebookPagesException(url, r.status_code)
         else:
-            self.options.add_argument(f"--window-size={window_width},{window_height}")
-        self.driver = webdriver.Chrome(options=self.options)
+            retry_after = None
+            if r.status_code == 503:
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                retry_after = min(retry_after, MAX_RETRY_AFTER) if retry_after is not None else None
+            raise HTTPStatusError(url, r.status_code, retry_after=retry_after)
+    return r
 
-    def run(self, zoom=80, load_wait=3):
-        SLEEP_DELAY = 5
-        error_log_file = os.path.join(self.output_dir, "error_log.txt")
-        os.makedirs(self.output_dir, exist_ok=True)
+def build_http_session(pool_size=16):
+    """建立共用連線池的 requests.Session，供預檢階段的多個執行緒重複使用連線。"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-        # 判斷是否讀取的是 domain CSV（檔名包含 "domain"）
-        is_domain_csv = "domain" in os.path.basename(self.csv_file).lower()
+class PreflightStatus:
+    """單一網址的預檢結果：status_code 為 HEAD 回應碼，error 為失敗原因（存活時為 None）。"""
+    def __init__(self, url, status_code=None, error=None, elapsed=0.0, retry_after=None, messages=None):
+        self.url = url
+        # 預檢執行緒中產生的重試訊息，由主流程依列序輸出
+        self.messages = messages or []
+        self.status_code = status_code
+        self.error = error
+        self.elapsed = elapsed
+        self.retry_after = retry_after
 
-        with open(self.csv_file, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            for row in reader:
-                if len(row) < 5:
-                    continue
-                url = row[2].strip()
-                domain = row[4].strip()
-                if not url:
-                    continue
+    @property
+    def live(self):
+        return self.error is None
 
-                try:
-                    r = get_status_with_retry(url, retries=3, backoff=5)
-                    if r.status_code not in [200, 429]:
-                        if "facebook.com" in url.lower():
-                            raise FacebookPagesException(url, r.status_code)
-                        else:
-                            raise HTTPStatusError(url, r.status_code)
-                    self.driver.get(url)
-                    time.sleep(load_wait)
-                    page_title = self.driver.title
-                    # 改用更精確的時間戳（含秒）
-                    timestamp = time.strftime("%m%d%H%M")
-                    safe_dom = safe_filename(domain)
-                    safe_tit = safe_filename(page_title)
-                    if is_domain_csv:
-                        base_filename = f"{timestamp}_1_{safe_dom}_{safe_tit}.png"
+class PreflightChecker:
+    """
+    瀏覽器階段之前的 HEAD 預檢：
+    以共用連線池的 Session 平行檢查所有網址（相同網址只檢查一次），
+    並以 per_host 限制同一主機的同時連線數。429 或連線失敗的重試等待只佔用預檢執行緒，不會卡住 driver。
+    """
+    def __init__(self, max_workers=16, per_host=2, retries=3):
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.retries = retries
+        self.session = build_http_session(self.max_workers)
+        self.host_locks = {}
+        self.lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        with self.lock:
+            if host not in self.host_locks:
+                self.host_locks[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_locks[host]
+
+    def check(self, url):
+        start = time.time()
+        messages = []
+        with self._host_semaphore(url):
+            try:
+                r = check_url_status(url, session=self.session, retries=self.retries, log=messages.append)
+                retry_after = None
+                if r.status_code == 429:
+                    retry_after = min(parse_retry_after(r.headers.get("Retry-After"), 5), MAX_RETRY_AFTER)
+                return PreflightStatus(url, r.status_code, elapsed=time.time() - start, retry_after=retry_after,
+                                       messages=messages)
+            except (FacebookPagesException, HTTPStatusError) as e:
+                return PreflightStatus(url, e.status_code, error=e, elapsed=time.time() - start,
+                                       retry_after=getattr(e, "retry_after", None), messages=messages)
+            except Exception as e:
+                return PreflightStatus(url, error=e, elapsed=time.time() - start, messages=messages)
+
+    def run(self, urls):
+        """回傳 {url: PreflightStatus}。"""
+        unique_urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            statuses = dict(zip(unique_urls, executor.map(self.check, unique_urls)))
+        self.session.close()
+        return statuses
+
+    @staticmethod
+    def write_table(statuses, table_file):
+        """將預檢結果輸出為 CSV 狀態表（url, host, status_code, live, elapsed, error）。"""
+        with open(table_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["url", "host", "status_code", "live", "elapsed", "error"])
+            for url, status in statuses.items():
+                writer.writerow([url, urlparse(url).hostname or "", status.status_code or "",
+                                 status.live, f"{status.elapsed:.2f}", str(status.error) if status.error else ""])
+
+# 分層 HTML 模式（--tiered）判斷是否需要改用瀏覽器的規則
+HTML_TIER_MIN_TEXT = 200
+DESKTOP_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36")
+SCRIPT_RE = re.compile(r"<script\b[^>]*>(.*?)</script\s*>", re.I | re.S)
+STYLE_RE = re.compile(r"<style\b[^>]*>.*?</style\s*>", re.I | re.S)
+TAG_RE = re.compile(r"<[^>]+>")
+TITLE_RE = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.I | re.S)
+META_REFRESH_RE = re.compile(r"<meta[^>]+http-equiv\s*=\s*[\"']?refresh", re.I)
+JS_REDIRECT_RE = re.compile(r"location(?:\.href)?\s*=[^=]|location\.(?:replace|assign)\s*\(", re.I)
+JS_GENERATED_RE = re.compile(r"document\.write\s*\(|\beval\s*\(|\batob\s*\(|\bunescape\s*\(", re.I)
+SPA_ROOT_RE = re.compile(r"<(div|main)\b[^>]*\bid\s*=\s*[\"']?(?:root|app|__next|__nuxt)[\"']?[^>]*>\s*</\1>", re.I)
+NOSCRIPT_RE = re.compile(r"<noscript\b[^>]*>.{0,200}?javascript", re.I | re.S)
+
+def detect_js_shell(source):
+    """
+    判斷 HTTP 取得的 HTML 是否需要瀏覽器執行 JavaScript 才有完整內容，回傳原因；可直接使用時回傳 None。
+    meta refresh、JS 轉址、document.write/eval 產生內容、空的 SPA 根節點、要求啟用 JavaScript，
+    或去除 script/style 後的可見文字過少（幾乎只有 script 的空殼）都改用瀏覽器。
+    """
+    if META_REFRESH_RE.search(source):
+        return "meta refresh"
+    scripts = SCRIPT_RE.findall(source)
+    inline = "\n".join(scripts)
+    if JS_REDIRECT_RE.search(inline):
+        return "js redirect"
+    if JS_GENERATED_RE.search(inline):
+        return "js generated"
+    if SPA_ROOT_RE.search(source):
+        return "spa root"
+    if NOSCRIPT_RE.search(source):
+        return "noscript"
+    text = TAG_RE.sub(" ", STYLE_RE.sub(" ", SCRIPT_RE.sub(" ", source)))
+    if len(" ".join(html.unescape(text).split())) < HTML_TIER_MIN_TEXT:
+        return "script-only" if scripts else "tiny body"
+    return None
+
+def parse_html_title(source):
+    """取出 <title> 文字，空白的處理方式與瀏覽器的 document.title 相同。"""
+    match = TITLE_RE.search(source)
+    if not match:
+        return ""
+    return " ".join(html.unescape(match.group(1)).split())
+
+class HTTPTierFetcher(PreflightChecker):
+    """
+    分層 HTML 模式的第一層：以共用連線池的 Session 直接 GET，不開啟瀏覽器。
+    與預檢相同以 per_host 限制同一主機的同時連線數；User-Agent 使用與 profile 相同的瀏覽器字串，
+    避免釣魚頁對非瀏覽器的請求回傳不同內容。
+    """
+    def __init__(self, max_workers=16, per_host=2, user_agent=DESKTOP_USER_AGENT):
+        super().__init__(max_workers=max_workers, per_host=per_host)
+        self.session.headers["User-Agent"] = user_agent
+
+    def fetch(self, url):
+        """回傳 (HTML, 需要改用瀏覽器的原因, 耗時秒數)；原因為 None 表示可直接使用。"""
+        start = time.time()
+        with self._host_semaphore(url):
+            try:
+                r = self.session.get(url, timeout=15)
+            except Exception as e:
+                return None, f"http error {type(e).__name__}", time.time() - start
+        if r.status_code != 200:
+            return None, f"http {r.status_code}", time.time() - start
+        content_type = r.headers.get("Content-Type", "").lower()
+        if "html" not in content_type:
+            return None, f"content-type {content_type or 'unknown'}", time.time() - start
+        if "charset" not in content_type:
+            r.encoding = r.apparent_encoding
+        source = r.text
+        return source, detect_js_shell(source), time.time() - start
+
+WAIT_STRATEGIES = ["ready", "eager", "network-idle", "fixed"]
+
+class PageWaiter:
+    """
+    頁面就緒等待策略（--wait-strategy）：
+      - ready：driver.get 後輪詢 document.readyState == "complete"
+      - eager：以 eager page load strategy 在 DOMContentLoaded 即返回，等到 readyState 為 interactive/complete
+      - network-idle：透過 CDP 的 Network 事件（performance log）等到沒有進行中的請求並持續 idle_time 秒
+      - fixed：舊有的固定等待（load_wait 秒、zoom 後 2 秒）
+    非 fixed 策略偵測失敗時退回固定等待；等待超過 timeout 秒（--wait-timeout）時已等得夠久，直接繼續擷取。
+    """
+    ZOOM_WAIT = 2
+
+    def __init__(self, strategy="ready", load_wait=3, timeout=15, idle_time=0.5):
+        self.strategy = strategy
+        self.load_wait = load_wait
+        self.timeout = timeout
+        self.idle_time = idle_time
+
+    def configure_options(self, options):
+        if self.strategy == "eager":
+            options.page_load_strategy = "eager"
+        elif self.strategy == "network-idle":
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    def before_navigate(self, driver):
+        if self.strategy == "network-idle":
+            # 清掉上一頁殘留的 performance log
+            driver.get_log("performance")
+
+    def wait_for_page(self, driver, result):
+        start = time.time()
+        label = self.strategy
+        try:
+            if self.strategy == "fixed":
+                time.sleep(self.load_wait)
+            elif self.strategy == "network-idle":
+                self._wait_network_idle(driver, result)
+            else:
+                states = ("interactive", "complete") if self.strategy == "eager" else ("complete",)
+                WebDriverWait(driver, self.timeout, poll_frequency=0.1).until(
+                    lambda d: d.execute_script("return document.readyState") in states)
+        except TimeoutException:
+            result.log(f"[PageWaiter] {self.strategy} 等待超過 {self.timeout:g} 秒，以目前的頁面繼續")
+            label = f"{self.strategy}->timeout"
+        except Exception as e:
+            result.log(f"[PageWaiter] {self.strategy} 等待失敗（{type(e).__name__}），改用固定等待 {self.load_wait} 秒")
+            time.sleep(self.load_wait)
+            label = f"{self.strategy}->fixed"
+        result.add_wait(label, time.time() - start, self.load_wait)
+
+    def wait_for_render(self, driver, result):
+        """zoom 套用後等待重新繪製：非 fixed 策略等兩個 animation frame。"""
+        start = time.time()
+        if self.strategy == "fixed":
+            time.sleep(self.ZOOM_WAIT)
+        else:
+            try:
+                driver.execute_async_script(
+                    "const done = arguments[arguments.length - 1];"
+                    "requestAnimationFrame(() => requestAnimationFrame(() => done()));")
+            except Exception:
+                time.sleep(self.ZOOM_WAIT)
+        result.add_wait(None, time.time() - start, self.ZOOM_WAIT)
+
+    def _wait_network_idle(self, driver, result):
+        inflight = set()
+        last_activity = time.time()
+        deadline = last_activity + self.timeout
+        while time.time() < deadline:
+            for entry in driver.get_log("performance"):
+                message = json.loads(entry["message"])["message"]
+                # 同一份 performance log 也供 ResourceBlocker 統計，讀過的事件留給它
+                result.network_events.append(message)
+                method = message.get("method")
+                request_id = message.get("params", {}).get("requestId")
+                if method == "Network.requestWillBeSent":
+                    inflight.add(request_id)
+                    last_activity = time.time()
+                elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                    inflight.discard(request_id)
+                    last_activity = time.time()
+            if not inflight and time.time() - last_activity >= self.idle_time:
+                if driver.execute_script("return document.readyState") == "complete":
+                    return
+            time.sleep(0.1)
+        raise TimeoutException(f"network idle not reached within {self.timeout}s")
+
+def extension_patterns(*extensions):
+    """
+    副檔名樣式只比對路徑結尾（.mp4 或 .mp4?query），
+    不會誤擋主機名稱中含有相同字串的網站（例如 www.avianca.com、www.movistar.es）。
+    """
+    return [pattern for ext in extensions for pattern in (f"*.{ext}", f"*.{ext}?*")]
+
+@functools.lru_cache(maxsize=None)
+def url_pattern_regex(pattern):
+    """setBlockedURLs 的樣式只有 * 是萬用字元（? 等其他字元照字面比對）。"""
+    return re.compile(".*".join(re.escape(part) for part in pattern.split("*")), re.DOTALL)
+
+# --block 各等級以 CDP Network.setBlockedURLs 封鎖的網址樣式（* 為萬用字元）
+BLOCK_MEDIA = extension_patterns("mp4", "webm", "m3u8", "mp3", "ogg", "wav", "mov", "avi")
+BLOCK_FONTS = extension_patterns("woff", "woff2", "ttf", "otf", "eot") + \
+    ["*fonts.googleapis.com*", "*fonts.gstatic.com*", "*use.typekit.net*"]
+BLOCK_IMAGES = extension_patterns("png", "jpg", "jpeg", "gif", "webp", "svg", "ico")
+BLOCK_ANALYTICS = ["*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+                   "*googlesyndication.com*", "*connect.facebook.net*", "*hotjar.com*", "*clarity.ms*",
+                   "*analytics.tiktok.com*", "*mc.yandex.ru*", "*scorecardresearch.com*", "*cdn.segment.com*"]
+BLOCK_WIDGETS = ["*youtube.com/embed*", "*player.vimeo.com*", "*platform.twitter.com*",
+                 "*embed.tawk.to*", "*widget.intercom.io*", "*cdn.livechatinc.com*", "*client.crisp.chat*"]
+BLOCK_LEVELS = {
+    "off": [],
+    # 截圖用：只擋影音與追蹤碼，不影響頁面外觀
+    "loose": BLOCK_MEDIA + BLOCK_ANALYTICS,
+    # HTML 用：page_source 不需要字型、圖片與第三方小工具
+    "strict": BLOCK_MEDIA + BLOCK_FONTS + BLOCK_IMAGES + BLOCK_ANALYTICS + BLOCK_WIDGETS,
+}
+
+def load_block_list(path):
+    """讀取自訂封鎖清單：一行一個網址樣式，# 開頭為註解。"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+class ResourceBlocker:
+    """
+    以 CDP Network.setBlockedURLs 封鎖與證據截圖無關的資源（影音、字型、追蹤碼等），縮短 driver.get 的載入時間。
+    封鎖數量與實際傳輸量由 performance log 的 Network 事件統計：
+    被封鎖的請求以 blockedReason 為 inspector 的 Network.loadingFailed 出現，
+    傳輸量為 Network.loadingFinished 的 encodedDataLength 合計。
+    被封鎖的資源不會下載，無法得知其大小；節省的流量以開啟與關閉 --block 的傳輸量比較。
+    setBlockedURLs 也會封鎖主文件，因此每次導航前會排除與該網址相符的樣式，要擷取的頁面本身永遠不會被封鎖。
+    """
+    def __init__(self, patterns):
+        self.patterns = list(dict.fromkeys(patterns))
+        # 各 driver 目前生效的樣式，只有需要改變時才重新呼叫 setBlockedURLs
+        self.active = weakref.WeakKeyDictionary()
+
+    def configure_options(self, options):
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    def install(self, driver):
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.patterns})
+        self.active[driver] = self.patterns
+
+    def patterns_for(self, url):
+        return [pattern for pattern in self.patterns if not url_pattern_regex(pattern).fullmatch(url)]
+
+    def before_navigate(self, driver, url):
+        patterns = self.patterns_for(url)
+        if self.active.get(driver) != patterns:
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            self.active[driver] = patterns
+        driver.get_log("performance")
+
+    def collect(self, driver, result):
+        """讀取剩餘的 performance log，統計該網址被封鎖的請求（依資源類型）與實際傳輸的位元組數。"""
+        events = result.network_events
+        events.extend(json.loads(entry["message"])["message"] for entry in driver.get_log("performance"))
+        request_types = {}
+        transferred = 0
+        for message in events:
+            params = message.get("params", {})
+            method = message.get("method")
+            if method == "Network.requestWillBeSent":
+                request_types[params.get("requestId")] = params.get("type", "Other")
+            elif method == "Network.loadingFailed" and params.get("blockedReason") == "inspector":
+                resource_type = params.get("type") or request_types.get(params.get("requestId"), "Other")
+                result.blocked[resource_type] = result.blocked.get(resource_type, 0) + 1
+            elif method == "Network.loadingFinished":
+                transferred += int(params.get("encodedDataLength", 0))
+        result.transferred_bytes = transferred
+        result.network_events = []
+        if result.blocked:
+            detail = ", ".join(f"{name} {count}" for name, count in sorted(result.blocked.items()))
+            result.log(f"[ResourceBlocker] 已封鎖 {sum(result.blocked.values())} 個請求（{detail}），"
+                       f"實際傳輸 {result.transferred_bytes / 1024:.0f} KB：{result.url}")
+
+
+def registered_domain(url):
+    """回傳網址的註冊網域（例如 a.b.example.co.uk → example.co.uk），無法解析時退回主機名稱。"""
+    host = (urlparse(url).hostname or "").lower()
+    return get_normalizer().host_registered_domain(host) or host
+
+class TokenBucket:
+    """單一註冊網域的 token bucket：每秒補充 rate 個 token，最多累積 capacity 個；blocked_until 用於 Retry-After。"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now):
+        """回傳下一個 token 可用的時間點（monotonic）。"""
+        if self.rate <= 0:
+            return max(now, self.blocked_until)
+        self._refill(now)
+        if self.tokens >= 1:
+            return max(now, self.blocked_until)
+        return max(now + (1 - self.tokens) / self.rate, self.blocked_until)
+
+    def consume(self, now):
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= 1
+
+class HostScheduler:
+    """
+    取代全域 SLEEP_DELAY 的工作佇列：以註冊網域分組，各網域各有一個 token bucket。
+    worker 取工作時，依列序挑選第一個「目前可送出請求」的網域；
+    某網域被限速（token 用完或 429/503 的 Retry-After）時，其他網域的工作照常進行。
+    有工作的網域只會在兩個 heap 之一：waiting 以 (可送出時間, 佇列第一筆的列序) 排序，
+    ready 以列序排序；取工作時只需把到期的網域移到 ready，不必每次排序全部網域。
+    """
+    def __init__(self, rate=0.2, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.cond = threading.Condition()
+        self.queues = {}
+        self.buckets = {}
+        self.waiting = []
+        self.ready = []
+        self.pending = 0
+
+    def _bucket(self, host):
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    def put(self, task, url):
+        """task 為 (index, url, targets, ...)，以 task[0] 作為排序依據。"""
+        host = registered_domain(url)
+        with self.cond:
+            tasks = self.queues.get(host)
+            if tasks is None:
+                # 沒有工作的網域已從 heap 與 queues 移除，重新加入時先放進 waiting，由 get() 檢查 token
+                tasks = self.queues[host] = collections.deque()
+                heapq.heappush(self.waiting, (0.0, task[0], host))
+            tasks.append(task)
+            self._bucket(host)
+            self.pending += 1
+            self.cond.notify()
+
+    def qsize(self):
+        with self.cond:
+            return self.pending
+
+    def get(self):
+        """取出下一個可執行的工作；所有工作都已取出時回傳 None。"""
+        with self.cond:
+            while True:
+                if self.pending == 0:
+                    return None
+                now = time.monotonic()
+                while self.waiting and self.waiting[0][0] <= now:
+                    _, head, host = heapq.heappop(self.waiting)
+                    heapq.heappush(self.ready, (head, host))
+                while self.ready:
+                    head, host = heapq.heappop(self.ready)
+                    bucket = self.buckets[host]
+                    # penalize() 可能在網域進入 ready 後才延後可送出時間，取出時再確認一次
+                    ready_at = bucket.ready_at(now)
+                    if ready_at > now:
+                        heapq.heappush(self.waiting, (ready_at, head, host))
+                        continue
+                    bucket.consume(now)
+                    self.pending -= 1
+                    tasks = self.queues[host]
+                    task = tasks.popleft()
+                    if tasks:
+                        heapq.heappush(self.waiting, (bucket.ready_at(now), tasks[0][0], host))
                     else:
-                        base_filename = f"{timestamp}_{safe_dom}_{safe_tit}.png"
-                    # 取得唯一的檔案路徑，避免覆蓋
-                    screenshot_path = os.path.join(self.output_dir, base_filename)
-
-                    self.driver.execute_script(f"document.body.style.zoom='{zoom}%'")
-                    time.sleep(2)
-                    self.driver.save_screenshot(screenshot_path)
-                    print(f"已截圖: {screenshot_path}")
-                    add_url_banner(screenshot_path, url)
-                except Exception as e:
-                    error_msg = f"錯誤 - 網域: {domain} / URL: {url} / 錯誤內容: {str(e)}\n"
-                    print(f"[ScreenshotTaker][錯誤] {error_msg}")
-                    with open(error_log_file, "a", encoding="utf-8") as error_file:
-                        error_file.write(error_msg)
-                finally:
-                    time.sleep(SLEEP_DELAY)
-        print("[ScreenshotTaker] CSV 中所有網址截圖完成！")
-        self.driver.quit()
-
-class HTMLDownloader:
-    def __init__(self, csv_file, output_dir, headless=True, is_mobile=False, window_width=1280, window_height=2000):
-        self.csv_file = csv_file
+                        del self.queues[host]
+                    return task
+                self.cond.wait(self.waiting[0][0] - now if self.waiting else None)
+
+    def drain(self):
+        """不理會限速，取出所有尚未執行的工作（依列序）；用於已沒有 worker 可處理時。"""
+        with self.cond:
+            tasks = sorted((task for queue in self.queues.values() for task in queue), key=lambda task: task[0])
+            self.queues.clear()
+            self.waiting.clear()
+            self.ready.clear()
+            self.pending = 0
+            self.cond.notify_all()
+            return tasks
+
+    def penalize(self, url, seconds):
+        """伺服器要求稍後再試（429/503 Retry-After）：在 seconds 秒內暫停該網域。"""
+        host = registered_domain(url)
+        with self.cond:
+            bucket = self._bucket(host)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+            self.cond.notify_all()
+
+class CaptureJournal:
+    """
+    每個輸出資料夾一份 append-only 的 capture_journal.jsonl，每處理完一列寫入一行：
+    {"time", "csv", "url", "profile", "status": "ok"/"failed", "outputs": [...], "error"}。
+    --resume 時略過已成功的列，--retry-failed 時只重跑最後一次狀態為 failed 的列。
+    """
+    FILE_NAME = "capture_journal.jsonl"
+
+    def __init__(self, output_dir, csv_name, profile):
+        self.path = os.path.join(output_dir, self.FILE_NAME)
+        self.csv_name = csv_name
+        self.profile = profile
+
+    def load_status(self):
+        """回傳 {url: 最後一次狀態}，只包含同一 CSV 與同一 profile 的紀錄。"""
+        statuses = {}
+        if not os.path.exists(self.path):
+            return statuses
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 程式中斷時最後一行可能不完整，直接略過
+                    continue
+                if entry.get("csv") == self.csv_name and entry.get("profile") == self.profile:
+                    statuses[entry.get("url")] = entry.get("status")
+        return statuses
+
+    def record(self, result):
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "csv": self.csv_name,
+            "url": result.url,
+            "profile": self.profile,
+            "status": result.status,
+            "outputs": result.outputs,
+            "error": str(result.error) if result.error is not None else None,
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+
+# 失敗分類時比對的錯誤訊息片段（Chrome 的 net::ERR_* 與 chromedriver 的錯誤訊息）
+DNS_ERROR_MARKERS = ("dns resolution failed", "err_name_not_resolved", "nameresolutionerror", "getaddrinfo failed",
+                     "name or service not known", "nodename nor servname", "temporary failure in name resolution")
+TIMEOUT_ERROR_MARKERS = ("err_timed_out", "err_connection_timed_out", "timed out", "timeout")
+CONNECTION_ERROR_MARKERS = ("err_connection_refused", "err_connection_reset", "err_connection_closed",
+                            "err_empty_response", "err_address_unreachable")
+DRIVER_CRASH_MARKERS = ("invalid session id", "chrome not reachable", "disconnected:", "session deleted",
+                        "tab crashed", "target window already closed", "no such window", "cannot connect to chrome")
+# 會放進延後重試佇列的失敗類型；4xx 與其他錯誤重試也不會成功，直接記錄
+RETRYABLE_FAILURES = ("timeout", "dns", "connection", "429", "5xx", "driver crash")
+
+def classify_failure(error):
+    """將失敗原因分類為 429、5xx、4xx、driver crash、dns、timeout、connection 或 other。"""
+    status_code = getattr(error, "status_code", None)
+    if status_code:
+        if status_code == 429:
+            return "429"
+        return "5xx" if status_code >= 500 else "4xx"
+    message = f"{type(error).__name__}: {error}".lower()
+    # selenium 以 urllib3 與 chromedriver 通訊；requests 的錯誤已包成 requests.RequestException，
+    # 因此直接出現的 urllib3 錯誤代表 chromedriver 已經無法連線
+    if (isinstance(error, (InvalidSessionIdException, Urllib3Error))
+            or any(marker in message for marker in DRIVER_CRASH_MARKERS)):
+        return "driver crash"
+    if any(marker in message for marker in DNS_ERROR_MARKERS):
+        return "dns"
+    if isinstance(error, (requests.Timeout, TimeoutException)) or any(m in message for m in TIMEOUT_ERROR_MARKERS):
+        return "timeout"
+    if isinstance(error, requests.ConnectionError) or any(m in message for m in CONNECTION_ERROR_MARKERS):
+        return "connection"
+    return "other"
+
+class RetryQueue:
+    """
+    失敗網址的延後重試佇列：主要流程跑完後才重試，不佔用 driver 等待。
+    只重試 RETRYABLE_FAILURES 類型的失敗；第 n 次失敗後等待 base_delay * 2^(n-1) 秒（上限 max_delay），
+    429 有 Retry-After 時取兩者較大值；每個網址最多嘗試 max_attempts 次（含第一次）。
+    """
+    def __init__(self, max_attempts=3, base_delay=10, max_delay=300):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.heap = []
+        self.attempts = {}
+        self.failures = collections.Counter()
+        self.deferred = 0
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap)
+
+    def attempt_of(self, index):
+        with self.lock:
+            return self.attempts.get(index, 1)
+
+    def record_failure(self, failure):
+        with self.lock:
+            self.failures[failure] += 1
+
+    def defer(self, result, retry_after=None):
+        """可重試時排入佇列並回傳等待秒數，否則回傳 None。"""
+        self.record_failure(result.failure)
+        if result.failure not in RETRYABLE_FAILURES or result.attempt >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** (result.attempt - 1))
+        if retry_after:
+            delay = max(delay, min(retry_after, MAX_RETRY_AFTER))
+        with self.lock:
+            self.deferred += 1
+            self.attempts[result.index] = result.attempt + 1
+            heapq.heappush(self.heap, (time.time() + delay, result.index, (result.index, result.url, result.targets)))
+        return delay
+
+    def next_ready(self):
+        with self.lock:
+            return self.heap[0][0] if self.heap else None
+
+    def pop_ready(self):
+        """取出所有已到重試時間的 task。"""
+        now = time.time()
+        tasks = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                tasks.append(heapq.heappop(self.heap)[2])
+        return tasks
+
+class CaptureResult:
+    """
+    單一網址的處理結果；訊息先暫存，由 OrderedReporter 依列序統一輸出。
+    targets 為該網址在各 CSV 中對應的 (domain, is_domain_csv)，每個 target 各有一組輸出檔名。
+    """
+    def __init__(self, index, url, targets):
+        self.index = index
+        self.url = url
+        self.targets = targets
+        self.domain = targets[0][0]
+        self.base_names = []
+        self.messages = []
+        self.outputs = []
+        self.pending = []
+        self.error = None
+        self.page_title = None
+        self.base_name = None
+        self.skipped = False
+        self.wait_strategy = None
+        self.wait_seconds = 0.0
+        self.fixed_wait_seconds = 0.0
+        self.encode_stats = None
+        self.status_code = None
+        self.timings = {}
+        self.network_events = []
+        self.blocked = {}
+        self.transferred_bytes = None
+        self.tier = None
+        self.attempt = 1
+        self.failure = None
+        self.deferred = False
+        self.phash = None
+
+    @property
+    def status(self):
+        """journal 與 stage_timing.jsonl 記錄的狀態：ok、failed，或已排入延後重試的 retry。"""
+        if self.deferred:
+            return "retry"
+        return "failed" if self.error is not None else "ok"
+
+    def log(self, msg):
+        self.messages.append(msg)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """計時一個處理階段；同名階段累加（例如 capture 模式的 HTML 與截圖都計入 write）。"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.time() - start)
+
+    def add_timing(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def add_encode(self, outcome):
+        self.encode_stats = outcome
+        for name, seconds in outcome.get("stages", {}).items():
+            self.add_timing(name, seconds)
+        if outcome.get("thumbnail"):
+            self.outputs.append(outcome["thumbnail"])
+        if outcome.get("phash"):
+            self.phash = outcome["phash"]
+
+    def add_wait(self, strategy, seconds, fixed_seconds):
+        """累計實際等待時間與舊固定等待的秒數，用來比較節省的時間。"""
+        if strategy:
+            self.wait_strategy = strategy
+        self.wait_seconds += seconds
+        self.fixed_wait_seconds += fixed_seconds
+
+# stage_timing.jsonl 記錄的處理階段（依實際執行順序）
+TIMING_STAGES = ["dns", "preflight", "http", "navigate", "wait", "title", "zoom", "screenshot", "banner", "write"]
+
+def percentile(values, pct):
+    """以 nearest-rank 計算百分位數。"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+class StageTimingLog:
+    """
+    每個輸出資料夾一份 append-only 的 stage_timing.jsonl，每處理完一列寫入一行：
+    {"time", "url", "domain", "profile", "status_code", "status", "error", "stages": {階段: 秒數}, "total"}。
+    用來判斷時間花在 HEAD 預檢、載入、等待、截圖或橫幅，以調整 load_wait、workers 與限速參數；
+    summary() 回傳各階段的 p50/p95。
+    """
+    FILE_NAME = "stage_timing.jsonl"
+
+    def __init__(self, output_dir, profile):
+        self.path = os.path.join(output_dir, self.FILE_NAME)
+        self.profile = profile
+        self.samples = collections.defaultdict(list)
+
+    def record(self, result):
+        stages = {name: round(result.timings[name], 3) for name in TIMING_STAGES if name in result.timings}
+        for name, seconds in stages.items():
+            self.samples[name].append(seconds)
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "url": result.url,
+            "domain": result.domain,
+            "profile": self.profile,
+            "tier": result.tier,
+            "status_code": result.status_code,
+            "attempt": result.attempt,
+            "failure": result.failure,
+            "status": result.status,
+            "error": str(result.error) if result.error is not None else None,
+            "stages": stages,
+            "total": round(sum(stages.values()), 3),
+            "blocked": sum(result.blocked.values()),
+            "transferred_bytes": result.transferred_bytes,
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def summary(self):
+        """回傳 [(階段, 筆數, p50, p95)]，只包含有資料的階段。"""
+        rows = []
+        for name in TIMING_STAGES:
+            values = self.samples.get(name)
+            if values:
+                rows.append((name, len(values), percentile(values, 50), percentile(values, 95)))
+        return rows
+
+class OrderedReporter:
+    """
+    多個 worker 同時處理時，依 CSV 列序輸出結果：
+    後面的列先完成時先暫存，等前面的列都完成才一併輸出，
+    因此 console 與 error_log.txt 的內容與單一 driver 執行時順序相同、不會交錯。
+    同一列的多次嘗試（延後重試）各自輸出並寫入 journal；該列已輸出後才完成的重試結果先暫存，
+    由 flush() 依列序輸出。
+    """
+    def __init__(self, error_log_file, log_tag, wait_log_file=None, journal=None, timing_log=None):
+        self.error_log_file = error_log_file
+        self.log_tag = log_tag
+        self.wait_log_file = wait_log_file
+        self.journal = journal
+        self.timing_log = timing_log
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.next_index = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.wait_seconds = 0.0
+        self.fixed_wait_seconds = 0.0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+        self.encoded_bytes = 0
+        self.source_bytes = 0
+        self.blocked = 0
+        self.transferred_bytes = 0
+        self.tiers = collections.Counter()
+        self.recovered = 0
+        self.late = []
+
+    def submit(self, result):
+        with self.lock:
+            if result.index < self.next_index:
+                # 延後重試的結果：該列先前已輸出，暫存到 flush() 再依列序輸出
+                self.late.append(result)
+                return
+            self.pending.setdefault(result.index, []).append(result)
+            while self.next_index in self.pending:
+                for pending_result in sorted(self.pending.pop(self.next_index), key=lambda r: r.attempt):
+                    self._emit(pending_result)
+                self.next_index += 1
+
+    def flush(self):
+        """依列序輸出暫存的延後重試結果；每輪重試結束與整個流程結束時呼叫。"""
+        with self.lock:
+            late, self.late = self.late, []
+            for result in sorted(late, key=lambda r: (r.index, r.attempt)):
+                self._emit(result)
+
+    def _emit(self, result):
+        for msg in result.messages:
+            print(msg)
+        if result.skipped:
+            self.skipped += 1
+            return
+        if result.deferred:
+            if self.journal:
+                self.journal.record(result)
+            if self.timing_log:
+                self.timing_log.record(result)
+            return
+        self.completed += 1
+        if result.attempt > 1 and result.error is None:
+            self.recovered += 1
+        if self.journal:
+            self.journal.record(result)
+        if self.timing_log:
+            self.timing_log.record(result)
+        if result.tier:
+            self.tiers[result.tier] += 1
+        self.blocked += sum(result.blocked.values())
+        self.transferred_bytes += result.transferred_bytes or 0
+        if result.encode_stats:
+            self.encoded += 1
+            self.encode_seconds += result.encode_stats["seconds"]
+            self.encoded_bytes += result.encode_stats["bytes"]
+            self.source_bytes += result.encode_stats["source_bytes"]
+        if result.wait_strategy and self.wait_log_file:
+            self._write_wait_log(result)
+        if result.error is None:
+            return
+        self.failed += 1
+        # 與各 CSV 分開執行時相同，每個對應的列各寫一筆錯誤
+        with open(self.error_log_file, "a", encoding="utf-8") as error_file:
+            for domain, _ in result.targets:
+                error_msg = f"錯誤 - 網域: {domain} / URL: {result.url} / 錯誤內容: {str(result.error)}\n"
+                print(f"[{self.log_tag}][錯誤] {error_msg}")
+                error_file.write(error_msg)
+
+    def _write_wait_log(self, result):
+        """每個網址一列：使用的等待策略、實際等待秒數與舊固定等待秒數。"""
+        self.wait_seconds += result.wait_seconds
+        self.fixed_wait_seconds += result.fixed_wait_seconds
+        write_header = not os.path.exists(self.wait_log_file)
+        with open(self.wait_log_file, "a", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(["url", "strategy", "wait_seconds", "fixed_wait_seconds", "saved_seconds"])
+            writer.writerow([result.url, result.wait_strategy, f"{result.wait_seconds:.2f}",
+                             f"{result.fixed_wait_seconds:.2f}",
+                             f"{result.fixed_wait_seconds - result.wait_seconds:.2f}"])
+
+# 瀏覽器池模式下，以 CDP 為每個分頁套用的裝置參數（與 chromedriver 內建的 Pixel 2 設定相同）
+PROFILE_EMULATION = {
+    "laptop": {"width": 1280, "height": 2000, "deviceScaleFactor": 1, "mobile": False},
+    "mobile": {"width": 411, "height": 731, "deviceScaleFactor": 2.625, "mobile": True},
+}
+PIXEL2_USER_AGENT = ("Mozilla/5.0 (Linux; Android 8.0.0; Pixel 2 Build/OPD3.170816.012) "
+                     "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Mobile Safari/537.36")
+
+def apply_profile_emulation(driver, profile, window_height=None):
+    """以 CDP 在目前分頁套用 laptop/mobile 的視窗大小、DPR、User-Agent 與觸控模擬。"""
+    metrics = dict(PROFILE_EMULATION[profile])
+    if window_height and profile == "laptop":
+        metrics["height"] = window_height
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", metrics)
+    if profile == "mobile":
+        driver.execute_cdp_cmd("Emulation.setUserAgentOverride", {"userAgent": PIXEL2_USER_AGENT})
+        driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": True, "maxTouchPoints": 5})
+
+class SharedBrowser:
+    """
+    瀏覽器池模式（--browser-pool）：整個 web_capture 只啟動一個 Chrome。
+    每個分頁以 CDP 建立獨立的 browser context（cookie、快取互不影響），
+    再以 debuggerAddress 連上一個輕量的 chromedriver session 操作該分頁；
+    裝置 profile 以 CDP Emulation 逐分頁設定，因此 laptop 與 mobile 可共用同一個 Chrome。
+    """
+    def __init__(self, headless=True):
+        options = build_chrome_options(headless, is_mobile=False, window_width=1280, window_height=900)
+        self.root = webdriver.Chrome(options=options)
+        self.debugger_address = self.root.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        self.lock = threading.Lock()
+        self.tabs = {}
+
+    def open_tab(self, profile, window_height=None, configure_options=None):
+        options = Options()
+        options.debugger_address = self.debugger_address
+        if configure_options:
+            configure_options(options)
+        with self.lock:
+            context = self.root.execute_cdp_cmd("Target.createBrowserContext", {})
+            target = self.root.execute_cdp_cmd("Target.createTarget", {
+                "url": "about:blank",
+                "browserContextId": context["browserContextId"],
+            })
+        driver = webdriver.Chrome(options=options)
+        driver.switch_to.window(target["targetId"])
+        apply_profile_emulation(driver, profile, window_height)
+        with self.lock:
+            self.tabs[id(driver)] = (context["browserContextId"], target["targetId"])
+        return driver
+
+    def close_tab(self, driver):
+        with self.lock:
+            context_id, target_id = self.tabs.pop(id(driver))
+            try:
+                self.root.execute_cdp_cmd("Target.closeTarget", {"targetId": target_id})
+                self.root.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+            except Exception as e:
+                print(f"[SharedBrowser][錯誤] 關閉分頁失敗：{e}")
+        # 以 debuggerAddress 連線的 session 結束時不會關閉 Chrome
+        driver.quit()
+
+    def close(self):
+        self.root.quit()
+
+class BaseCapture:
+    """
+    ScreenshotTaker / HTMLDownloader / WebCapturer 共用的流程：
+    逐列讀取 CSV → HEAD 預檢 → driver.get → 交給子類別輸出檔案，錯誤寫入 error_log.txt。
+    子類別只需實作 capture_page()。
+    workers > 1 時，由多個 driver 從共用佇列取出網址平行處理。
+    preflight 開啟時，HEAD 預檢在瀏覽器階段之前由 PreflightChecker 一次平行完成，
+    失效或 4xx 的網址直接寫入 error_log.txt，不佔用 driver。
+    傳入 browser（SharedBrowser）時，不另外啟動 Chrome，每個 worker 是共用 Chrome 中的一個分頁。
+    """
+    LOG_TAG = "BaseCapture"
+    DONE_MESSAGE = "CSV 中所有網址處理完成！"
+    # --block auto 時採用的封鎖等級，依模式設定
+    DEFAULT_BLOCK_LEVEL = "off"
+
+    def __init__(self, csv_file, output_dir, headless=True, is_mobile=False, window_width=1280, window_height=2000,
+                 wait_strategy="ready", wait_timeout=15, page_load_timeout=None, browser=None, block_level="auto",
+                 block_list=None):
+        # csv_file 可為單一路徑或路徑 list（例如 total.csv 與 domain.csv 一次處理）
+        self.csv_files = [csv_file] if isinstance(csv_file, str) else list(csv_file)
         self.output_dir = output_dir
         self.headless = headless
         self.is_mobile = is_mobile
+        self.profile = "mobile" if is_mobile else "laptop"
+        self.page_load_timeout = page_load_timeout
+        self.window_height = window_height
+        self.browser = browser
 
-        self.options = Options()
-        if self.headless:
-            self.options.add_argument('--headless')
-            self.options.add_argument('--no-sandbox')
-        if self.is_mobile:
-            self.options.add_experimental_option("mobileEmulation", MOBILE_EMULATION)
-        else:
-            self.options.add_argument(f"--window-size={window_width},{window_height}")
-        self.driver = webdriver.Chrome(options=self.options)
+        self.waiter = PageWaiter(wait_strategy, timeout=wait_timeout)
+        if block_level == "auto":
+            block_level = self.DEFAULT_BLOCK_LEVEL
+        patterns = BLOCK_LEVELS[block_level] + (load_block_list(block_list) if block_list else [])
+        self.blocker = ResourceBlocker(patterns) if patterns else None
+        self.options = build_chrome_options(headless, is_mobile, window_width, window_height)
+        self.configure_options(self.options)
+        self.driver = self.create_driver()
+        self.inline_status_check = True
+        self.cache = None
 
-    def run(self, load_wait=3):
-        SLEEP_DELAY = 5
-        error_log_file = os.path.join(self.output_dir, "error_log.txt")
-        os.makedirs(self.output_dir, exist_ok=True)
+    def configure_options(self, options):
+        self.waiter.configure_options(options)
+        if self.blocker:
+            self.blocker.configure_options(options)
 
-        is_domain_csv = "domain" in os.path.basename(self.csv_file).lower()
+    def create_driver(self):
+        if self.browser:
+            driver = self.browser.open_tab(self.profile, self.window_height, self.configure_options)
+        else:
+            driver = webdriver.Chrome(options=self.options)
+        if self.page_load_timeout:
+            driver.set_page_load_timeout(self.page_load_timeout)
+        if self.blocker:
+            self.blocker.install(driver)
+        return driver
+
+    def release_driver(self, driver):
+        if self.browser:
+            self.browser.close_tab(driver)
+        else:
+            driver.quit()
 
-        with open(self.csv_file, "r", encoding="utf-8") as f:
+    def iter_rows(self, csv_file):
+        """讀取 CSV，逐列回傳 (url, domain)，略過欄位不足或網址為空的列。"""
+        with open(csv_file, "r", encoding="utf-8") as f:
             reader = csv.reader(f)
             header = next(reader, None)
             for row in reader:
@@ -182,64 +1207,855 @@ class HTMLDownloader:
                 domain = row[4].strip()
                 if not url:
                     continue
+                yield url, domain
+
+    def build_rows(self):
+        """
+        讀取所有 CSV，依正規化網址合併成工作清單 [(index, url, targets)]，index 為網址第一次出現的順序。
+        targets 為該網址出現過的 (domain, is_domain_csv)（檔名包含 "domain" 的 CSV 為 True），不重複。
+        domain.csv 的網址常被 merge_csv 改寫成同一個 https://www.<註冊網域>，
+        合併後每個 profile 只需載入一次，再把檔案分送到每個 target 的檔名。
+        """
+        tasks = {}
+        for csv_file in self.csv_files:
+            is_domain_csv = "domain" in os.path.basename(csv_file).lower()
+            for url, domain in self.iter_rows(csv_file):
+                _, targets = tasks.setdefault(normalize_url(url), (url, []))
+                if (domain, is_domain_csv) not in targets:
+                    targets.append((domain, is_domain_csv))
+        return [(index, url, targets) for index, (url, targets) in enumerate(tasks.values())]
+
+    def capture_page(self, driver, result, base_name, **kwargs):
+        raise NotImplementedError
+
+    def artifact_paths(self, base_name):
+        """回傳 {kind: 輸出檔路徑}，kind 為副檔名（png/webp/jpg/html），經 cache_kind 對應為快取的檔案類型。"""
+        raise NotImplementedError
 
+    def cache_kind(self, kind):
+        """
+        輸出檔類型對應的快取類型：會改變輸出內容的設定（整頁截圖、分層 HTML）放進快取類型，
+        不同設定的執行不會拿到彼此的快取。
+        """
+        return kind
+
+    def cache_kinds(self):
+        return tuple(self.cache_kind(kind) for kind in self.artifact_paths(""))
+
+    def navigate(self, driver, result):
+        self.waiter.before_navigate(driver)
+        if self.blocker:
+            self.blocker.before_navigate(driver, result.url)
+        with result.stage("navigate"):
+            try:
+                driver.get(result.url)
+            except TimeoutException:
+                # 只有設定 --page-load-timeout 時才是預期的逾時；否則交給失敗分類記為 timeout
+                if not self.page_load_timeout:
+                    raise
+                # 超過 --page-load-timeout：停止載入，以目前已載入的內容繼續
+                driver.execute_script("window.stop();")
+                result.log(f"[{self.LOG_TAG}] 頁面載入超過 {self.page_load_timeout} 秒，已停止載入：{result.url}")
+        with result.stage("wait"):
+            self.waiter.wait_for_page(driver, result)
+
+    def process_url(self, driver, result, **kwargs):
+        # 重試時一律重新 HEAD 檢查，避免把 5xx 錯誤頁當成正常頁面截圖
+        if self.inline_status_check or result.attempt > 1:
+            with result.stage("preflight"):
+                result.status_code = check_url_status(result.url, retries=self.status_retries,
+                                                      log=result.log).status_code
+        result.tier = "browser"
+        self.navigate(driver, result)
+        with result.stage("title"):
+            result.page_title = driver.title
+        result.base_names = [build_base_filename(domain, result.page_title, is_domain_csv)
+                             for domain, is_domain_csv in result.targets]
+        result.base_name = result.base_names[0]
+        self.capture_page(driver, result, result.base_name, **kwargs)
+        if self.blocker:
+            self.blocker.collect(driver, result)
+
+    def submit_encode(self, result, fn, *args):
+        """
+        將編碼寫檔工作交給背景 process pool；fn 回傳 write_screenshot 格式的統計 dict。
+        同時進行中的工作數受 encode_slots 限制，避免編碼跟不上時記憶體持續增加。
+        """
+        self.encode_slots.acquire()
+        try:
+            future = self.encoder.submit(fn, *args)
+        except Exception:
+            # 例如 BrokenProcessPool：工作沒有送出，不會有 done-callback 釋放名額
+            self.encode_slots.release()
+            raise
+        future.add_done_callback(lambda f: self.encode_slots.release())
+        result.pending.append(future)
+
+    def finish(self, result, reporter):
+        """等該列的背景編碼都完成後，才寫入快取並交給 reporter。"""
+        pending = result.pending
+        if not pending:
+            self.complete(result, reporter)
+            return
+        remaining = [len(pending)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            for future in pending:
                 try:
-                    r = get_status_with_retry(url, retries=3, backoff=5)
-                    if r.status_code not in [200, 429]:
-                        if "facebook.com" in url.lower():
-                            raise FacebookPagesException(url, r.status_code)
-                        else:
-                            raise HTTPStatusError(url, r.status_code)
-                    self.driver.get(url)
-                    time.sleep(load_wait)
-                    page_title = self.driver.title
-                    timestamp = time.strftime("%m%d%H%M")
-                    safe_dom = safe_filename(domain)
-                    safe_tit = safe_filename(page_title)
-                    if is_domain_csv:
-                        base_filename = f"{timestamp}_1_{safe_dom}_{safe_tit}.html"
-                    else:
-                        base_filename = f"{timestamp}_{safe_dom}_{safe_tit}.html"
-                    html_path = os.path.join(self.output_dir, base_filename)
-                    with open(html_path, "w", encoding="utf-8") as html_file:
-                        html_file.write(self.driver.page_source)
-                    print(f"已存檔網頁原始碼: {html_path}")
+                    outcome = future.result()
+                    result.log(outcome["message"])
+                    result.add_encode(outcome)
                 except Exception as e:
-                    error_msg = f"錯誤 - 網域: {domain} / URL: {url} / 錯誤內容: {str(e)}\n"
-                    print(f"[HTMLDownloader][錯誤] {error_msg}")
-                    with open(error_log_file, "a", encoding="utf-8") as error_file:
-                        error_file.write(error_msg)
-                finally:
-                    time.sleep(SLEEP_DELAY)
-        print("[HTMLDownloader] CSV 中所有網址原始檔下載完成！")
-        self.driver.quit()
+                    if result.error is None:
+                        result.error = e
+            self.complete(result, reporter)
+
+        for future in pending:
+            future.add_done_callback(on_done)
+
+    def complete(self, result, reporter):
+        # 可能在背景編碼的 done-callback 中執行，例外會被吞掉；reporter.submit 一定要執行，否則 OrderedReporter 會一直等這一列
+        try:
+            if result.error is None and result.base_name:
+                if self.cache:
+                    for kind, path in self.artifact_paths(result.base_name).items():
+                        if os.path.exists(path):
+                            self.cache.store(result.url, self.profile, self.cache_kind(kind), result.page_title, path)
+                self.fan_out(result)
+                self.record_outputs(result)
+        except Exception as e:
+            result.error = e
+        finally:
+            reporter.submit(result)
+
+    def fan_out(self, result):
+        """同一網址對應多個 target 時，把第一個檔名的輸出以硬連結／複製分送到其他檔名。"""
+        primary = self.artifact_paths(result.base_name)
+        for base_name in result.base_names[1:]:
+            if base_name == result.base_name:
+                continue
+            for kind, path in self.artifact_paths(base_name).items():
+                if os.path.exists(primary[kind]):
+                    link_or_copy(primary[kind], path)
+                    result.outputs.append(path)
+                    result.log(f"已複製: {path}")
+
+    def record_outputs(self, result):
+        """輸出檔都已就緒（擷取完成、分送或從快取取得）後的 hook，子類別可在此建立索引。"""
+
+    def new_result(self, index, url, targets):
+        """建立要實際擷取的 CaptureResult，並帶入批次預檢的狀態碼與耗時。"""
+        result = CaptureResult(index, url, targets)
+        result.attempt = self.retry_queue.attempt_of(index)
+        if result.attempt == 1:
+            self.add_dns_timing(result)
+            status = self.preflight_statuses.get(url)
+            if status:
+                for msg in status.messages:
+                    result.log(msg)
+                result.status_code = status.status_code
+                result.add_timing("preflight", status.elapsed)
+        return result
+
+    def add_dns_timing(self, result):
+        status = self.dns_statuses.get(urlparse(result.url).hostname or "")
+        if status and not status.cached:
+            result.add_timing("dns", status.elapsed)
+
+    def run_dns(self, rows, reporter, resolver):
+        """
+        批次 DNS 預解析：同時解析所有主機，NXDOMAIN 或沒有位址紀錄的網址直接記錄錯誤，
+        不再進行 HEAD 預檢與瀏覽器載入；回傳仍需處理的列。解析結果寫入跨執行共用的 DNS 快取。
+        """
+        hosts = [(urlparse(url).hostname or "").lower() for _, url, _ in rows]
+        start = time.time()
+        self.dns_statuses = resolver.run(hosts)
+        remaining = []
+        for (index, url, targets), host in zip(rows, hosts):
+            status = self.dns_statuses.get(host)
+            if status is None or not status.dead:
+                remaining.append((index, url, targets))
+                continue
+            result = CaptureResult(index, url, targets)
+            result.error = DNSResolutionError(url, host, status.status)
+            result.failure = "dns"
+            self.add_dns_timing(result)
+            reporter.submit(result)
+        dead_hosts = sum(status.dead for status in self.dns_statuses.values())
+        print(f"[{self.LOG_TAG}] DNS 預解析完成：{len(self.dns_statuses)} 個主機（快取命中 {resolver.cache_hits} 個），"
+              f"失效 {dead_hosts} 個，{len(rows) - len(remaining)} 筆直接略過，耗時 {time.time() - start:.1f} 秒")
+        return remaining
+
+    def prefetch(self, rows, reporter, preflight_workers=16, per_host=2):
+        """瀏覽器階段之前的額外處理，回傳仍需以瀏覽器處理的列；預設不處理。"""
+        return rows
+
+    def defer_failure(self, result, retry_after=None):
+        """分類失敗原因，可重試時排入延後重試佇列並標記為 deferred。"""
+        result.failure = classify_failure(result.error)
+        delay = self.retry_queue.defer(result, retry_after)
+        if delay is not None:
+            result.deferred = True
+            result.log(f"[{self.LOG_TAG}][重試] {result.failure}：{result.url}（{result.error}），"
+                       f"{delay:.0f} 秒後進行第 {result.attempt + 1} 次嘗試")
+
+    def restart_driver(self, slot):
+        """
+        driver 當掉時關閉並重新建立，讓同一個 worker 繼續處理剩下的網址。
+        重新建立失敗時該 slot 保持 None，不會在延後重試時又拿已經當掉的 driver 來用。
+        """
+        driver, self.drivers[slot] = self.drivers[slot], None
+        if driver is not None:
+            try:
+                self.release_driver(driver)
+            except Exception:
+                pass
+        self.drivers[slot] = self.create_driver()
+        return self.drivers[slot]
+
+    def _worker(self, slot, scheduler, reporter, kwargs):
+        driver = self.drivers[slot]
+        if driver is None:
+            # 上一輪重新啟動失敗的 worker，延後重試時再試一次
+            try:
+                driver = self.restart_driver(slot)
+            except Exception as e:
+                print(f"[{self.LOG_TAG}][錯誤] driver 重新啟動失敗，worker {slot} 停止：{e}")
+                return
+        while True:
+            task = scheduler.get()
+            if task is None:
+                return
+            result = self.new_result(*task)
+            try:
+                self.process_url(driver, result, **kwargs)
+            except Exception as e:
+                result.error = e
+                retry_after = getattr(e, "retry_after", None)
+                self.defer_failure(result, retry_after)
+                if retry_after:
+                    scheduler.penalize(result.url, retry_after)
+            finally:
+                self.finish(result, reporter)
+            if result.failure == "driver crash":
+                try:
+                    driver = self.restart_driver(slot)
+                    print(f"[{self.LOG_TAG}] driver 已重新啟動（worker {slot}）")
+                except Exception as e:
+                    print(f"[{self.LOG_TAG}][錯誤] driver 重新啟動失敗，worker {slot} 停止：{e}")
+                    return
+
+    def run_workers(self, scheduler, reporter, kwargs):
+        threads = []
+        for slot in range(len(self.drivers)):
+            t = threading.Thread(target=self._worker, args=(slot, scheduler, reporter, kwargs))
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+        self.fail_remaining(scheduler, reporter)
+
+    def fail_remaining(self, scheduler, reporter):
+        """所有 worker 都因 driver 無法重新啟動而停止時，scheduler 中剩下的網址記錄為失敗，不會無聲消失。"""
+        tasks = scheduler.drain()
+        if tasks:
+            print(f"[{self.LOG_TAG}][錯誤] 沒有可用的 driver，剩下 {len(tasks)} 個網址未擷取")
+        for task in tasks:
+            result = self.new_result(*task)
+            result.error = RuntimeError("driver 重新啟動失敗，沒有可用的 worker，未擷取")
+            result.failure = "driver crash"
+            self.retry_queue.record_failure(result.failure)
+            self.finish(result, reporter)
+
+    def drain_retries(self, scheduler, reporter, kwargs):
+        """主要流程結束後，依到期時間把延後重試的網址放回 scheduler，直到佇列清空。"""
+        while len(self.retry_queue):
+            wait = self.retry_queue.next_ready() - time.time()
+            if wait > 0:
+                print(f"[{self.LOG_TAG}] 延後重試佇列剩 {len(self.retry_queue)} 筆，{wait:.0f} 秒後開始下一輪重試")
+                time.sleep(wait)
+            for task in self.retry_queue.pop_ready():
+                scheduler.put(task, task[1])
+            self.run_workers(scheduler, reporter, kwargs)
+            reporter.flush()
+
+    def run_preflight(self, rows, reporter, preflight_workers=16, per_host=2):
+        """
+        平行 HEAD 預檢所有網址並輸出 preflight_status.csv；
+        失效的列直接交給 reporter 記錄錯誤（逾時、DNS、5xx 等可重試的失敗排入延後重試佇列），
+        回傳 (仍需進入瀏覽器階段的列, 預檢結果)。
+        """
+        checker = PreflightChecker(max_workers=preflight_workers, per_host=per_host, retries=self.status_retries)
+        statuses = checker.run([url for _, url, _ in rows])
+        checker.write_table(statuses, os.path.join(self.output_dir, "preflight_status.csv"))
+
+        live_rows = []
+        for index, url, targets in rows:
+            status = statuses[url]
+            if status.live:
+                live_rows.append((index, url, targets))
+            else:
+                result = CaptureResult(index, url, targets)
+                for msg in status.messages:
+                    result.log(msg)
+                result.error = status.error
+                result.status_code = status.status_code
+                self.add_dns_timing(result)
+                result.add_timing("preflight", status.elapsed)
+                self.defer_failure(result, status.retry_after)
+                reporter.submit(result)
+        print(f"[{self.LOG_TAG}] 預檢完成：{len(statuses)} 個網址，存活 {sum(s.live for s in statuses.values())} 個，"
+              f"{len(rows) - len(live_rows)} 筆略過瀏覽器階段")
+        return live_rows, statuses
+
+    def apply_cache(self, rows, reporter):
+        """
+        快取中已有新鮮擷取結果的列，直接以硬連結／複製產生輸出檔，不開啟網頁也不做預檢；
+        回傳仍需擷取的列。
+        """
+        remaining = []
+        for index, url, targets in rows:
+            hit = self.cache.lookup(url, self.profile, self.cache_kinds())
+            if hit is None:
+                remaining.append((index, url, targets))
+                continue
+            page_title, cached_paths, captured_at = hit
+            result = CaptureResult(index, url, targets)
+            result.tier = "cache"
+            result.page_title = page_title
+            try:
+                for domain, is_domain_csv in targets:
+                    # 檔名的時間戳記沿用原始擷取時間，不會把舊截圖標成今天擷取的
+                    base_name = build_base_filename(domain, page_title, is_domain_csv, captured_at)
+                    result.base_names.append(base_name)
+                    for kind, path in self.artifact_paths(base_name).items():
+                        link_or_copy(cached_paths[self.cache_kind(kind)], path)
+                        result.outputs.append(path)
+                        result.log(f"已從快取取得: {path}")
+                self.record_outputs(result)
+            except Exception as e:
+                result.error = e
+            reporter.submit(result)
+        print(f"[{self.LOG_TAG}] 快取命中 {len(rows) - len(remaining)} 筆，需擷取 {len(remaining)} 筆")
+        return remaining
+
+    def apply_journal(self, rows, reporter, journal, resume=False, retry_failed=False):
+        """
+        依 journal 過濾要處理的列：
+          - resume：略過最後狀態為 ok 的列
+          - retry_failed：只保留最後狀態為 failed（或中斷時仍在延後重試佇列 retry）的列
+        被略過的列仍交給 reporter（標記 skipped），以維持列序輸出。
+        """
+        statuses = journal.load_status()
+        remaining = []
+        for index, url, targets in rows:
+            status = statuses.get(url)
+            if retry_failed:
+                keep = status in ("failed", "retry")
+            else:
+                keep = status != "ok"
+            if keep:
+                remaining.append((index, url, targets))
+            else:
+                result = CaptureResult(index, url, targets)
+                result.skipped = True
+                reporter.submit(result)
+        print(f"[{self.LOG_TAG}] 依 journal 略過 {len(rows) - len(remaining)} 筆，剩餘 {len(remaining)} 筆")
+        return remaining
+
+    def run(self, load_wait=3, workers=1, preflight=True, preflight_workers=16, per_host=2,
+            host_rate=0.2, host_burst=1, resume=False, retry_failed=False,
+            cache_dir=None, cache_ttl=24, cache_max_mb=2048, encode_workers=2,
+            max_attempts=3, retry_base_delay=10, retry_max_delay=300,
+            dns=True, dns_cache=None, dns_workers=32, dns_timeout=5, dns_ttl=6, dns_negative_ttl=1,
+            dns_resolver=None, **kwargs):
+        # 耗時與 URLs/min 從頭計算，包含快取、DNS、預檢等前置階段
+        start_time = time.time()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.retry_queue = RetryQueue(max_attempts, retry_base_delay, retry_max_delay)
+        # 有延後重試時，HEAD 預檢只試一次，不在迴圈中 sleep 等待
+        self.status_retries = 1 if self.retry_queue.max_attempts > 1 else 3
+
+        rows = self.build_rows()
+        row_count = sum(len(targets) for _, _, targets in rows)
+        if row_count > len(rows):
+            print(f"[{self.LOG_TAG}] {len(self.csv_files)} 個 CSV 共 {row_count} 筆，合併重複網址後需處理 {len(rows)} 個網址")
+        csv_name = "+".join(os.path.basename(csv_file) for csv_file in self.csv_files)
+        journal = CaptureJournal(self.output_dir, csv_name, self.profile)
+        timing_log = StageTimingLog(self.output_dir, self.profile)
+        reporter = OrderedReporter(os.path.join(self.output_dir, "error_log.txt"), self.LOG_TAG,
+                                   wait_log_file=os.path.join(self.output_dir, "wait_log.csv"),
+                                   journal=journal, timing_log=timing_log)
+        if resume or retry_failed:
+            rows = self.apply_journal(rows, reporter, journal, resume=resume, retry_failed=retry_failed)
+        if cache_dir:
+            self.cache = CaptureCache(cache_dir, ttl_hours=cache_ttl, max_bytes=int(cache_max_mb * 1024 * 1024))
+            rows = self.apply_cache(rows, reporter)
+        self.dns_statuses = {}
+        if dns:
+            cache = DNSCache(dns_cache, ttl_hours=dns_ttl, negative_ttl_hours=dns_negative_ttl) if dns_cache else None
+            resolver = DNSPreResolver(cache, max_workers=dns_workers, timeout=dns_timeout,
+                                      resolver=dns_resolver)
+            try:
+                rows = self.run_dns(rows, reporter, resolver)
+            finally:
+                if cache:
+                    cache.close()
+        self.waiter.load_wait = load_wait
+        self.inline_status_check = not preflight
+        # 以註冊網域為單位限速，取代每個網址後固定 sleep 5 秒
+        scheduler = HostScheduler(rate=host_rate, burst=host_burst)
+        self.preflight_statuses = {}
+        if preflight:
+            rows, statuses = self.run_preflight(rows, reporter, preflight_workers=preflight_workers, per_host=per_host)
+            self.preflight_statuses = statuses
+            # 429（仍會擷取）與 503（排入延後重試）都依 Retry-After 暫停該網域
+            for status in statuses.values():
+                if status.retry_after:
+                    scheduler.penalize(status.url, status.retry_after)
+
+        rows = self.prefetch(rows, reporter, preflight_workers=preflight_workers, per_host=per_host)
+
+        for row in rows:
+            scheduler.put(row, row[1])
+        total = scheduler.qsize()
+
+        # worker 數量不超過網址數；第一個 worker 沿用 __init__ 建立的 driver
+        workers = max(1, min(workers, max(total, len(self.retry_queue))))
+        self.drivers = [self.driver]
+        # 截圖編碼在背景 process pool 進行（不受 GIL 限制），driver 截完圖即可前往下一個網址
+        self.encoder = ProcessPoolExecutor(max_workers=max(1, encode_workers))
+        self.encode_slots = threading.BoundedSemaphore(max(1, encode_workers) * 2)
+        try:
+            for _ in range(workers - 1):
+                self.drivers.append(self.create_driver())
+
+            self.run_workers(scheduler, reporter, kwargs)
+            self.drain_retries(scheduler, reporter, kwargs)
+            self.encoder.shutdown(wait=True)
+            elapsed = time.time() - start_time
+        finally:
+            self.encoder.shutdown(wait=True)
+            # 背景編碼都完成後，輸出仍暫存的重試結果
+            reporter.flush()
+            for driver in self.drivers:
+                if driver is not None:
+                    self.release_driver(driver)
+            if self.cache:
+                evicted = self.cache.evict()
+                if evicted:
+                    print(f"[{self.LOG_TAG}] 快取超過大小上限，已淘汰 {evicted} 筆最久未使用的項目")
+                self.cache.close()
+
+        rate = reporter.completed / (elapsed / 60) if elapsed > 0 else 0.0
+        print(f"[{self.LOG_TAG}] {self.DONE_MESSAGE}")
+        print(f"[{self.LOG_TAG}] 共 {reporter.completed} 筆（失敗 {reporter.failed} 筆，journal 略過 {reporter.skipped} 筆），"
+              f"workers={len(self.drivers)}，耗時 {elapsed:.1f} 秒，約 {rate:.2f} URLs/min")
+        if self.retry_queue.failures:
+            detail = ", ".join(f"{name} {count}" for name, count in self.retry_queue.failures.most_common())
+            print(f"[{self.LOG_TAG}] 失敗分類（含重試）：{detail}；延後重試 {self.retry_queue.deferred} 次，"
+                  f"重試後成功 {reporter.recovered} 筆")
+        print(f"[{self.LOG_TAG}] 等待策略 {self.waiter.strategy}：實際等待 {reporter.wait_seconds:.1f} 秒，"
+              f"固定等待需 {reporter.fixed_wait_seconds:.1f} 秒，節省 {reporter.fixed_wait_seconds - reporter.wait_seconds:.1f} 秒")
+        if reporter.encoded:
+            mb = 1024 * 1024
+            print(f"[{self.LOG_TAG}] 影像編碼 {reporter.encoded} 張：輸出 {reporter.encoded_bytes / mb:.1f} MB，"
+                  f"Chrome 原始 PNG {reporter.source_bytes / mb:.1f} MB，"
+                  f"節省 {(reporter.source_bytes - reporter.encoded_bytes) / mb:.1f} MB，"
+                  f"編碼耗時合計 {reporter.encode_seconds:.1f} 秒")
+        if reporter.tiers.get("http"):
+            print(f"[{self.LOG_TAG}] 分層擷取：HTTP {reporter.tiers['http']} 筆、瀏覽器 {reporter.tiers['browser']} 筆、"
+                  f"快取 {reporter.tiers['cache']} 筆，省下 {reporter.tiers['http']} 次瀏覽器載入")
+        if self.blocker:
+            print(f"[{self.LOG_TAG}] 資源封鎖 {len(self.blocker.patterns)} 個樣式：共封鎖 {reporter.blocked} 個請求，"
+                  f"實際傳輸 {reporter.transferred_bytes / (1024 * 1024):.1f} MB")
+        stage_summary = timing_log.summary()
+        if stage_summary:
+            print(f"[{self.LOG_TAG}] 各階段耗時（詳見 {StageTimingLog.FILE_NAME}）：")
+            for name, count, p50, p95 in stage_summary:
+                print(f"[{self.LOG_TAG}]   {name:<10} {count:>5} 筆  p50 {p50:.2f} 秒  p95 {p95:.2f} 秒")
+
+class ScreenshotTaker(BaseCapture):
+    LOG_TAG = "ScreenshotTaker"
+    DONE_MESSAGE = "CSV 中所有網址截圖完成！"
+    DEFAULT_BLOCK_LEVEL = "loose"
+
+    def __init__(self, csv_file, output_dir, full_page=False, max_height=16000, tile_height=4000,
+                 image_format="png", jpeg_quality=85, thumbnail_width=0, **driver_options):
+        # 整頁截圖以 CDP 擷取，不需要 1280x2000 的大視窗
+        if full_page and "window_height" not in driver_options:
+            driver_options["window_height"] = 900
+        super().__init__(csv_file, output_dir, **driver_options)
+        self.full_page = full_page
+        self.max_height = max_height
+        self.tile_height = tile_height
+        self.image_format = image_format
+        self.image_ext = IMAGE_FORMATS[image_format][0]
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_width = thumbnail_width
+        self.screenshot_index = None
+
+    def run(self, zoom=80, **run_options):
+        # 截圖指紋索引與截圖放在同一資料夾，供 screenshot_index.py 將相同的釣魚網頁分組
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.screenshot_index = ScreenshotIndex(os.path.join(self.output_dir, ScreenshotIndex.FILE_NAME))
+        try:
+            super().run(zoom=zoom, **run_options)
+        finally:
+            self.screenshot_index.close()
+            self.screenshot_index = None
+
+    def record_outputs(self, result):
+        """把每個 target 的截圖寫入指紋索引；快取取得的截圖沒有編碼結果，改從檔案切掉 50px 橫幅後計算。"""
+        if self.screenshot_index is None:
+            return
+        phash = result.phash
+        for (domain, _), base_name in zip(result.targets, result.base_names):
+            path = self.artifact_paths(base_name)[self.image_ext]
+            if not os.path.exists(path):
+                continue
+            if phash is None:
+                with Image.open(path) as img:
+                    phash = dhash(img.crop((0, 50, img.width, img.height)))
+            self.screenshot_index.add(path, result.url, domain, self.profile, result.page_title, phash)
+
+    def grab_screenshot(self, driver):
+        if self.full_page:
+            return capture_full_page(driver, self.max_height, self.tile_height)
+        return driver.get_screenshot_as_png()
+
+    def save_screenshot(self, driver, result, base_name, zoom=80):
+        screenshot_path = os.path.join(self.output_dir, f"{base_name}.{self.image_ext}")
+        thumbnail_path = None
+        if self.thumbnail_width:
+            thumbnail_dir = os.path.join(self.output_dir, "thumbs")
+            os.makedirs(thumbnail_dir, exist_ok=True)
+            thumbnail_path = os.path.join(thumbnail_dir, f"{base_name}.jpg")
+
+        with result.stage("zoom"):
+            driver.execute_script(f"document.body.style.zoom='{zoom}%'")
+            self.waiter.wait_for_render(driver, result)
+        with result.stage("screenshot"):
+            png_bytes = self.grab_screenshot(driver)
+        result.outputs.append(screenshot_path)
+        self.submit_encode(result, write_screenshot, png_bytes, result.url, screenshot_path,
+                           self.image_format, self.jpeg_quality, thumbnail_path, self.thumbnail_width)
+
+    def capture_page(self, driver, result, base_name, zoom=80):
+        self.save_screenshot(driver, result, base_name, zoom=zoom)
+
+    def artifact_paths(self, base_name):
+        return {self.image_ext: os.path.join(self.output_dir, f"{base_name}.{self.image_ext}")}
+
+    def cache_kind(self, kind):
+        if kind == self.image_ext and self.full_page:
+            return f"{kind}-fullpage{self.max_height}"
+        return super().cache_kind(kind)
+
+class HTMLDownloader(BaseCapture):
+    LOG_TAG = "HTMLDownloader"
+    DONE_MESSAGE = "CSV 中所有網址原始檔下載完成！"
+    DEFAULT_BLOCK_LEVEL = "strict"
+
+    def __init__(self, csv_file, output_dir, tiered=False, **driver_options):
+        super().__init__(csv_file, output_dir, **driver_options)
+        # 分層模式：先以 HTTP 取得，只有 JS 產生內容的頁面才交給瀏覽器；escalations 記錄改用瀏覽器的原因
+        self.tiered = tiered
+        self.escalations = {}
+
+    def save_html(self, driver, result, base_name, html_dir=None):
+        html_path = os.path.join(html_dir or self.output_dir, f"{base_name}.html")
+        self.write_html(result, html_path, driver.page_source)
+
+    def write_html(self, result, html_path, source):
+        if self.tiered:
+            # 分層模式在檔案開頭註記內容來源，瀏覽器層另記改用瀏覽器的原因
+            label = result.tier
+            if result.url in self.escalations:
+                label = f"{label} ({self.escalations[result.url]})"
+            source = f"<!-- web_capture tier: {label} -->\n{source}"
+        with result.stage("write"):
+            with open(html_path, "w", encoding="utf-8") as html_file:
+                html_file.write(source)
+        result.outputs.append(html_path)
+        result.log(f"已存檔網頁原始碼: {html_path}")
+
+    def prefetch(self, rows, reporter, preflight_workers=16, per_host=2):
+        """
+        分層模式的 HTTP 層：平行 GET 所有待處理的網址，看起來是靜態頁面的直接存檔，
+        JS 空殼、meta refresh、非 200 或非 HTML 的網址才留給瀏覽器階段。
+        """
+        if not self.tiered or not rows:
+            return rows
+        user_agent = PIXEL2_USER_AGENT if self.is_mobile else DESKTOP_USER_AGENT
+        fetcher = HTTPTierFetcher(max_workers=preflight_workers, per_host=per_host, user_agent=user_agent)
+        with ThreadPoolExecutor(max_workers=fetcher.max_workers) as executor:
+            fetched = list(executor.map(fetcher.fetch, [url for _, url, _ in rows]))
+        fetcher.session.close()
+
+        remaining = []
+        reasons = collections.Counter()
+        for (index, url, targets), (source, reason, seconds) in zip(rows, fetched):
+            if reason is not None:
+                self.escalations[url] = reason
+                reasons[reason] += 1
+                remaining.append((index, url, targets))
+                continue
+            result = self.new_result(index, url, targets)
+            result.tier = "http"
+            result.add_timing("http", seconds)
+            try:
+                result.page_title = parse_html_title(source)
+                result.base_names = [build_base_filename(domain, result.page_title, is_domain_csv)
+                                     for domain, is_domain_csv in targets]
+                result.base_name = result.base_names[0]
+                self.write_html(result, self.artifact_paths(result.base_name)["html"], source)
+            except Exception as e:
+                result.error = e
+            self.complete(result, reporter)
+        detail = ", ".join(f"{reason} {count}" for reason, count in reasons.most_common())
+        print(f"[{self.LOG_TAG}] HTTP 層直接取得 {len(rows) - len(remaining)} 筆，"
+              f"{len(remaining)} 筆改用瀏覽器" + (f"（{detail}）" if detail else ""))
+        return remaining
+
+    def capture_page(self, driver, result, base_name):
+        self.save_html(driver, result, base_name)
+
+    def artifact_paths(self, base_name):
+        return {"html": os.path.join(self.output_dir, f"{base_name}.html")}
+
+    def cache_kind(self, kind):
+        # 分層模式的 HTML 可能是 HTTP 直接取得的原始碼，且開頭有 tier 註記，與瀏覽器的 page_source 分開快取
+        if kind == "html" and self.tiered:
+            return "html-tiered"
+        return super().cache_kind(kind)
+
+class WebCapturer(ScreenshotTaker, HTMLDownloader):
+    """
+    capture 模式：每個網址只載入一次，同時輸出 HTML 原始碼與 PNG 截圖。
+    HTML 在套用 zoom 之前存檔，內容與 HTMLDownloader 相同；檔名沿用既有命名規則。
+    """
+    LOG_TAG = "WebCapturer"
+    DONE_MESSAGE = "CSV 中所有網址截圖與原始檔下載完成！"
+    # 同時輸出截圖，採用截圖的封鎖等級
+    DEFAULT_BLOCK_LEVEL = "loose"
+
+    def __init__(self, csv_file, output_dir, html_output_dir=None, **driver_options):
+        super().__init__(csv_file, output_dir, **driver_options)
+        self.html_output_dir = html_output_dir or output_dir
+
+    def run(self, zoom=80, **run_options):
+        os.makedirs(self.html_output_dir, exist_ok=True)
+        super().run(zoom=zoom, **run_options)
+
+    def capture_page(self, driver, result, base_name, zoom=80):
+        self.save_html(driver, result, base_name, html_dir=self.html_output_dir)
+        self.save_screenshot(driver, result, base_name, zoom=zoom)
+
+    def artifact_paths(self, base_name):
+        return {
+            self.image_ext: os.path.join(self.output_dir, f"{base_name}.{self.image_ext}"),
+            "html": os.path.join(self.html_output_dir, f"{base_name}.html"),
+        }
+
+def build_capturer(mode, csv_files, out_dir, html_dir, image_options, driver_options, tiered=False):
+    if mode == "capture":
+        return WebCapturer(csv_files, out_dir, html_output_dir=html_dir, **image_options, **driver_options)
+    elif mode == "screenshot":
+        return ScreenshotTaker(csv_files, out_dir, **image_options, **driver_options)
+    return HTMLDownloader(csv_files, out_dir, tiered=tiered, **driver_options)
+
+def run_browser_pool(mode, csv_files, output_root, profiles, tabs, image_options, driver_options, run_options,
+                     tiered=False):
+    """
+    瀏覽器池模式：所有 profile 共用一個 Chrome，輸出至 {output_root}/{profile}/png 與 html。
+    同時開啟的分頁總數不超過 tabs：平均分配給各 profile（餘數給前面的 profile）；
+    tabs 少於 profile 數時，每次只執行 tabs 個 profile、各一個分頁。
+    """
+    tabs = max(1, tabs)
+    browser = SharedBrowser(headless=driver_options.get("headless", True))
+    try:
+        errors = []
+
+        def run_profile(profile, profile_tabs):
+            # capturer 建立時就會開啟第一個分頁，因此在輪到該 profile 時才建立
+            try:
+                png_dir = os.path.join(output_root, profile, "png")
+                html_dir = os.path.join(output_root, profile, "html")
+                out_dir = html_dir if mode == "html" else png_dir
+                options = dict(driver_options, is_mobile=(profile == "mobile"), browser=browser)
+                capturer = build_capturer(mode, csv_files, out_dir, html_dir, image_options, options, tiered=tiered)
+                capturer.run(**dict(run_options, workers=profile_tabs))
+            except Exception as e:
+                errors.append(e)
+                print(f"[{profile}][錯誤] {e}")
+
+        for start in range(0, len(profiles), tabs):
+            batch = profiles[start:start + tabs]
+            threads = [threading.Thread(target=run_profile,
+                                        args=(profile, tabs // len(batch) + (i < tabs % len(batch))))
+                       for i, profile in enumerate(batch)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        if errors:
+            raise errors[0]
+    finally:
+        browser.close()
 
 def main():
     try:
         parser = argparse.ArgumentParser(description="Web Capture Tool")
-        parser.add_argument("mode", choices=["screenshot", "html"], help="選擇功能: screenshot 或 html")
-        parser.add_argument("--csv", type=str, default=None, help="CSV 檔案路徑 (預設：./csv_stuff/total.csv)")
-        parser.add_argument("--output", type=str, default=None, help="輸出資料夾 (預設依模式設定)")
+        parser.add_argument("mode", choices=["screenshot", "html", "capture"],
+                            help="選擇功能: screenshot、html 或 capture（單次載入同時輸出截圖與 HTML）")
+        parser.add_argument("--csv", type=str, nargs="+", default=None,
+                            help="CSV 檔案路徑，可指定多個（重複網址只擷取一次）(預設：./csv_stuff/total.csv)")
+        parser.add_argument("--output", type=str, default=None, help="輸出資料夾 (預設依模式設定；capture 模式為 PNG 資料夾)")
+        parser.add_argument("--html-output", type=str, default=None, help="capture 模式的 HTML 輸出資料夾 (預設：./output_html)")
         parser.add_argument("--no-headless", action="store_false", dest="headless", help="停用 headless 模式")
         parser.add_argument("--mobile", action="store_true", help="啟用手機模擬模式")
+        parser.add_argument("--workers", type=int, default=1, help="同時運作的 Chrome driver 數量 (預設：1)")
+        parser.add_argument("--browser-pool", action="store_true",
+                            help="瀏覽器池模式：只啟動一個 Chrome，各 profile 以獨立的 browser context 分頁擷取")
+        parser.add_argument("--tabs", type=int, default=4, help="瀏覽器池模式下同時開啟的分頁總數上限，平均分配給各 profile (預設：4)")
+        parser.add_argument("--profiles", type=str, default="laptop,mobile",
+                            help="瀏覽器池模式要擷取的裝置 profile，以逗號分隔 (預設：laptop,mobile)")
+        parser.add_argument("--output-root", type=str, default=None,
+                            help="瀏覽器池模式的輸出根目錄，結果寫入 {root}/{profile}/png 與 html (預設：./output)")
+        parser.add_argument("--wait-strategy", choices=WAIT_STRATEGIES, default="ready",
+                            help="頁面就緒等待策略 (預設：ready；fixed 為舊有固定等待)")
+        parser.add_argument("--wait-timeout", type=float, default=15,
+                            help="ready／eager／network-idle 策略等待頁面就緒的最長秒數，逾時即以目前頁面繼續 (預設：15)")
+        parser.add_argument("--page-load-timeout", type=float, default=None,
+                            help="driver.get 的頁面載入逾時秒數，逾時即停止載入並繼續 (預設：不設定)")
+        parser.add_argument("--block", choices=["auto"] + list(BLOCK_LEVELS), default="auto",
+                            help="資源封鎖等級：off、loose（影音與追蹤碼）、strict（另加字型、圖片與第三方小工具）；"
+                                 "auto 依模式決定，screenshot/capture 為 loose、html 為 strict (預設：auto)")
+        parser.add_argument("--block-list", type=str, default=None,
+                            help="自訂封鎖清單檔案，一行一個網址樣式（* 為萬用字元），附加在 --block 等級之上")
+        parser.add_argument("--load-wait", type=float, default=3, help="固定等待秒數，非 fixed 策略時僅作為退回用 (預設：3)")
+        parser.add_argument("--no-preflight", action="store_false", dest="preflight",
+                            help="停用平行 HEAD 預檢，改回在瀏覽器迴圈中逐筆檢查")
+        parser.add_argument("--preflight-workers", type=int, default=16, help="HEAD 預檢的平行連線數 (預設：16)")
+        parser.add_argument("--per-host", type=int, default=2, help="預檢時同一主機的最大同時連線數 (預設：2)")
+        parser.add_argument("--host-rate", type=float, default=0.2,
+                            help="每個註冊網域每秒可開啟的頁面數，0 表示不限速 (預設：0.2，即同網域每 5 秒一頁)")
+        parser.add_argument("--host-burst", type=int, default=1, help="每個註冊網域可累積的 token 數 (預設：1)")
+        parser.add_argument("--resume", action="store_true",
+                            help="依輸出資料夾中的 capture_journal.jsonl 略過已成功的列，從中斷處繼續")
+        parser.add_argument("--retry-failed", action="store_true",
+                            help="只重跑 capture_journal.jsonl 中最後狀態為失敗的列")
+        parser.add_argument("--max-attempts", type=int, default=3,
+                            help="每個網址最多嘗試次數；逾時、DNS、429、5xx、driver 當掉等失敗在主要流程後延後重試，1 表示不重試 (預設：3)")
+        parser.add_argument("--retry-base-delay", type=float, default=10,
+                            help="延後重試的基本等待秒數，每次失敗加倍 (預設：10)")
+        parser.add_argument("--retry-max-delay", type=float, default=300, help="延後重試的最長等待秒數 (預設：300)")
+        parser.add_argument("--no-dns", action="store_false", dest="dns", help="停用批次 DNS 預解析")
+        parser.add_argument("--dns-cache", type=str, default=None,
+                            help="跨執行共用的 DNS 快取檔 (預設：./dns_cache.sqlite3)")
+        parser.add_argument("--dns-workers", type=int, default=32, help="DNS 預解析的同時查詢數 (預設：32)")
+        parser.add_argument("--dns-timeout", type=float, default=5, help="單一主機的 DNS 查詢逾時秒數 (預設：5)")
+        parser.add_argument("--dns-ttl", type=float, default=6, help="可解析主機的快取時間（小時）(預設：6)")
+        parser.add_argument("--dns-negative-ttl", type=float, default=1,
+                            help="NXDOMAIN／無位址主機的快取時間（小時）(預設：1)")
+        parser.add_argument("--dns-stub", type=str, default=None,
+                            help="以 hosts 格式的對照檔取代系統 DNS（離線測試用，未列出的主機視為 NXDOMAIN）")
+        parser.add_argument("--cache-dir", type=str, default=None, help="跨執行的擷取快取資料夾 (預設：./capture_cache)")
+        parser.add_argument("--cache-ttl", type=float, default=24, help="快取新鮮時間（小時），超過即重新擷取；快取命中的檔名保留原始擷取時間 (預設：24)")
+        parser.add_argument("--cache-max-mb", type=float, default=2048, help="快取大小上限 MB，超過時依 LRU 淘汰 (預設：2048)")
+        parser.add_argument("--no-cache", action="store_true", help="停用擷取快取")
+        parser.add_argument("--tiered", action="store_true",
+                            help="html 模式：先以 HTTP 直接取得，只有 JS 產生內容、meta refresh 等頁面才以瀏覽器載入")
+        parser.add_argument("--index-html", action="store_true",
+                            help="擷取完成後平行解析 HTML 資料夾，更新 html_index.sqlite3 指標索引（只處理新增或變更的檔案）")
+        parser.add_argument("--index-workers", type=int, default=None, help="建立 HTML 索引的 process 數 (預設：CPU 核心數)")
+        parser.add_argument("--full-page", action="store_true",
+                            help="以 CDP 擷取整頁截圖（不受視窗高度限制）")
+        parser.add_argument("--max-height", type=int, default=16000, help="整頁截圖的最大高度，單位為 CSS px（mobile 輸出圖片的像素約為 2.6 倍）；寬度固定為視窗寬度 (預設：16000)")
+        parser.add_argument("--encode-workers", type=int, default=2, help="背景處理截圖橫幅與編碼的 process 數 (預設：2)")
+        parser.add_argument("--image-format", choices=list(IMAGE_FORMATS), default="png",
+                            help="截圖輸出格式：png、png-optimized、webp（無損）或 jpeg (預設：png)")
+        parser.add_argument("--jpeg-quality", type=int, default=85, help="jpeg 格式的品質 1-95 (預設：85)")
+        parser.add_argument("--thumbnail-width", type=int, default=0,
+                            help="另存縮圖至 thumbs/ 的寬度 px，0 表示不產生 (預設：0)")
         args = parser.parse_args()
 
         base_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-        csv_file = args.csv if args.csv else os.path.join(base_dir, "csv_stuff", "total.csv")
+        driver_options = {
+            "headless": args.headless,
+            "is_mobile": args.mobile,
+            "wait_strategy": args.wait_strategy,
+            "wait_timeout": args.wait_timeout,
+            "page_load_timeout": args.page_load_timeout,
+            "block_level": args.block,
+            "block_list": args.block_list,
+        }
+        image_options = {
+            "full_page": args.full_page,
+            "max_height": args.max_height,
+            "image_format": args.image_format,
+            "jpeg_quality": args.jpeg_quality,
+            "thumbnail_width": args.thumbnail_width,
+        }
+        run_options = {
+            "load_wait": args.load_wait,
+            "workers": args.workers,
+            "preflight": args.preflight,
+            "preflight_workers": args.preflight_workers,
+            "per_host": args.per_host,
+            "host_rate": args.host_rate,
+            "host_burst": args.host_burst,
+            "resume": args.resume,
+            "retry_failed": args.retry_failed,
+            "cache_dir": None if args.no_cache else (args.cache_dir or os.path.join(base_dir, "capture_cache")),
+            "cache_ttl": args.cache_ttl,
+            "cache_max_mb": args.cache_max_mb,
+            "encode_workers": args.encode_workers,
+            "dns": args.dns,
+            "dns_cache": args.dns_cache or os.path.join(base_dir, "dns_cache.sqlite3"),
+            "dns_workers": args.dns_workers,
+            "dns_timeout": args.dns_timeout,
+            "dns_ttl": args.dns_ttl,
+            "dns_negative_ttl": args.dns_negative_ttl,
+            "dns_resolver": StubResolver.from_file(args.dns_stub) if args.dns_stub else None,
+            "max_attempts": args.max_attempts,
+            "retry_base_delay": args.retry_base_delay,
+            "retry_max_delay": args.retry_max_delay,
+        }
+
+        csv_files = args.csv if args.csv else [os.path.join(base_dir, "csv_stuff", "total.csv")]
+        if args.browser_pool:
+            profiles = [p.strip() for p in args.profiles.split(",") if p.strip() in PROFILE_EMULATION]
+            if not profiles:
+                raise ValueError(f"--profiles 沒有可用的 profile：{args.profiles}")
+            output_root = args.output_root if args.output_root else os.path.join(base_dir, "output")
+            run_browser_pool(args.mode, csv_files, output_root, profiles, args.tabs,
+                             image_options, driver_options, run_options, tiered=args.tiered)
+            if args.index_html and args.mode != "screenshot":
+                for profile in profiles:
+                    build_index(os.path.join(output_root, profile, "html"), workers=args.index_workers)
+            return
+
         if args.output:
             out_dir = args.output
         else:
-            if args.mode == "screenshot":
+            if args.mode in ("screenshot", "capture"):
                 out_dir = os.path.join(base_dir, "output_screenshot")
             else:
                 out_dir = os.path.join(base_dir, "output_html")
 
-        if args.mode == "screenshot":
-            taker = ScreenshotTaker(csv_file, out_dir, headless=args.headless, is_mobile=args.mobile)
-            taker.run()
-        else:
-            downloader = HTMLDownloader(csv_file, out_dir, headless=args.headless, is_mobile=args.mobile)
-            downloader.run()
+        html_dir = args.html_output if args.html_output else os.path.join(base_dir, "output_html")
+        capturer = build_capturer(args.mode, csv_files, out_dir, html_dir, image_options, driver_options,
+                                  tiered=args.tiered)
+        capturer.run(**run_options)
+        if args.index_html and args.mode != "screenshot":
+            build_index(html_dir if args.mode == "capture" else out_dir, workers=args.index_workers)
     except Exception as e:
         global_error_log = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "global_error_log.txt")
         error_msg = f"全域錯誤: {str(e)}\n"
@@ -248,4 +2064,6 @@ def main():
             error_file.write(error_msg)
 
 if __name__ == "__main__":
+    # PyInstaller 打包後使用 process pool 需要 freeze_support
+    multiprocessing.freeze_support()
     main()